@@ -1,19 +1,45 @@
 import sys
-import io
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QPushButton, QGroupBox, QFormLayout, QComboBox,
-                             QScrollArea)
-from PyQt5.QtGui import QPixmap, QImage, QDoubleValidator, QFont
+                             QScrollArea, QCheckBox, QStackedWidget, QPlainTextEdit, QFileDialog)
+from PyQt5.QtGui import QImage, QDoubleValidator, QFont
 from PyQt5.QtCore import Qt, QTimer
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import numpy as np
-import matplotlib.pyplot as plt
+
+import tracing
+from ingest import read_table
+from option_charts import BlitChart, apply_style, chart_geometry, fit_layout, match_option_type, parse_row
+from payoff_preview import PayoffPreview
+
+TRACE_REFRESH_MS = 500  # 性能统计状态栏刷新间隔
+
+
+def app_geometry(option_type, params):
+    """局部重绘和实时预览用的图形几何：与共享几何相同，
+    只有看跌单鲨/价差沿用本应用plot_sharkfin_put的标签格式"""
+    geom = chart_geometry(option_type, params)
+    if option_type == '看跌单鲨/价差':
+        strike, knock_out = params['strike'], params['knock_out']
+        min_ret, max_ret = params['min_ret'], params['max_ret']
+        x, y, _, ha, va = geom['texts'][3]
+        geom['texts'][3] = (x, y, f"参与率{params['participation_rate']:.2f}%", ha, va)
+        geom['xticks'] = ([strike, knock_out], [str(strike) + '%', str(knock_out) + '%'], 11)
+        geom['yticks'] = ([min_ret, max_ret], [str(min_ret) + '%', str(max_ret) + '%'], 11)
+        # 标题中期限与结构名之间不留空格
+        geom['title'] = geom['title'].replace(f"{params['month']} ", str(params['month']), 1)
+    return geom
 
 
 class OptionApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, render_mode='blit'):
         super().__init__()
+        # 'blit': 复用图元并局部重绘；'full': 每次清空坐标轴后完整重绘
+        self.render_mode = render_mode
+
+        # 性能统计：开启后状态栏定时显示各阶段耗时的分位数，关闭时追踪点几乎无开销
+        self.trace_label = None  # 状态栏控件，首次开启时创建
+        self.trace_timer = QTimer(self)
+        self.trace_timer.setInterval(TRACE_REFRESH_MS)
+        self.trace_timer.timeout.connect(self.refresh_trace_status)
         self.setWindowTitle("期权结构图")
         self.setGeometry(100, 100, 300, 300)
 
@@ -94,10 +120,11 @@ class OptionApp(QMainWindow):
         self.params = self.option_types[self.current_option]['params'].copy()
         
         # 创建UI
+        self.canvas = None
         self.init_ui()
         
-        # 初始绘图
-        self.update_plot()
+        # 窗口显示后再加载matplotlib并绘制首图
+        QTimer.singleShot(0, self.init_chart)
     
     def init_ui(self):
         # 主布局
@@ -124,6 +151,16 @@ class OptionApp(QMainWindow):
         self.type_combo.currentTextChanged.connect(self.change_option_type)
             
         type_layout.addWidget(self.type_combo)
+
+        self.live_preview_check = QCheckBox("实时预览")
+        self.live_preview_check.setFont(self.font)
+        self.live_preview_check.toggled.connect(self.toggle_live_preview)
+        type_layout.addWidget(self.live_preview_check)
+
+        self.trace_check = QCheckBox("性能统计")
+        self.trace_check.setFont(self.font)
+        self.trace_check.toggled.connect(self.toggle_tracing)
+        type_layout.addWidget(self.trace_check)
         
         left_layout.addWidget(type_group)
 
@@ -133,25 +170,38 @@ class OptionApp(QMainWindow):
         parse_layout = QHBoxLayout()
         parse_group.setLayout(parse_layout)
         
-        self.parse_text = QLineEdit()
+        # 多行文本框，保留表头行和数据行之间的换行
+        self.parse_text = QPlainTextEdit()
         self.parse_text.setFont(self.font)
         self.parse_text.setPlaceholderText("在此粘贴参数表格...")
-        self.parse_text.setMinimumHeight(32)  # 设置最小高度
+        self.parse_text.setFixedHeight(64)
         parse_layout.addWidget(self.parse_text, stretch=1)
         
+        parse_buttons = QVBoxLayout()
         parse_btn = QPushButton("一键解析")
         parse_btn.setFont(self.font)
         parse_btn.clicked.connect(self.parse_parameters)
-        parse_layout.addWidget(parse_btn)
+        parse_buttons.addWidget(parse_btn)
+
+        open_btn = QPushButton("打开文件")
+        open_btn.setFont(self.font)
+        open_btn.clicked.connect(self.open_file)
+        parse_buttons.addWidget(open_btn)
+        parse_layout.addLayout(parse_buttons)
         
         left_layout.addWidget(parse_group)
         
-        # 图表区域
-        self.figure = Figure(figsize=(6.8, 5.3))
-        self.canvas = FigureCanvas(self.figure)
-        self.canvas.setFixedSize(680, 530)
-        self.ax = self.figure.add_subplot(111)
-        left_layout.addWidget(self.canvas, stretch=1)
+        # 图表区域：画布与实时预览叠放；画布由init_chart创建
+        # 实时预览用QPainter直接绘制收益结构，不经过matplotlib，可跟随每次输入
+        self.loading_label = QLabel("图表加载中…")
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        self.loading_label.setFixedSize(680, 530)
+        self.payoff_preview = PayoffPreview(geometry=app_geometry)
+        self.payoff_preview.setFixedSize(680, 530)
+        self.chart_stack = QStackedWidget()
+        self.chart_stack.addWidget(self.loading_label)
+        self.chart_stack.addWidget(self.payoff_preview)
+        left_layout.addWidget(self.chart_stack, stretch=1)
         
         # 右侧区域 - 参数设置
         right_widget = QWidget()
@@ -178,7 +228,30 @@ class OptionApp(QMainWindow):
         # 添加到主布局
         main_layout.addWidget(left_widget, stretch=1)
         main_layout.addWidget(right_widget)
+
+        # 设置了CHART_TRACE=1时默认开启性能统计
+        self.trace_check.setChecked(tracing.is_enabled())
     
+    def init_chart(self):
+        # matplotlib导入和字体注册较慢，放到窗口出现之后
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
+        apply_style()
+        self.figure = Figure(figsize=(6.8, 5.3))
+        self.canvas = FigureCanvas(self.figure)
+        self.canvas.setFixedSize(680, 530)
+        if self.render_mode == 'blit':
+            self.blit_chart = BlitChart(self.figure, geometry=app_geometry)
+        else:
+            self.ax = self.figure.add_subplot(111)
+        self.chart_stack.removeWidget(self.loading_label)
+        self.loading_label.deleteLater()
+        self.chart_stack.insertWidget(0, self.canvas)
+
+        # 初始绘图
+        self.update_plot()
+
     def update_and_copy(self):
         """更新图表并复制到剪贴板"""
         self.update_plot()
@@ -186,167 +259,78 @@ class OptionApp(QMainWindow):
     
     def parse_parameters(self):
         """从粘贴的表格文本中解析参数并更新界面"""
-        text = self.parse_text.text().strip()
+        text = self.parse_text.toPlainText().strip()
         if not text:
             return
         
         try:
-            # 初始化参数字典
             params = {}
             structure_type = None  # 用于存储识别出的结构类型
             
             # 处理表格格式的文本
             lines = [line.strip() for line in text.split('\n') if line.strip()]
             
-            # 示例文本格式处理
+            # 假设第一行是表头，第二行是数据；表头按header_schema编译后逐列转换
             if len(lines) >= 2 and '\t' in lines[1]:
-                # 假设第一行是表头，第二行是数据
-                headers = lines[0].split('\t')
-                values = lines[1].split('\t')
-                
-                # 创建键值对映射
-                for header, value in zip(headers, values):
-                    header = header.strip().lower()
-                    value = value.strip()
-                    
-                    if not value or value == '-':
-                        continue
-                    
-                    # 根据表头识别参数
-                    if '结构' in header:
-                        structure_type = value
-                    elif '标的' in header:
-                        params['asset'] = value
-                    elif '期限' in header:
-                        params['month'] = value.replace('天', 'D').replace('月', 'M')
-                    elif '行权价' in header:
-                        params['strike'] = float(value.replace('%', ''))
-                    elif '障碍价' in header or '敲出价' in header:
-                        params['knock_out'] = float(value.replace('%', ''))
-                    elif '敲入价' in header:
-                        params['knock_in'] = float(value.replace('%', ''))
-                    elif '保底年化收益' in header and not '期权' in header:
-                        params['min_ret'] = float(value.replace('%', ''))
-                    elif '敲出年化收益' in header and not '期权' in header:
-                        params['knock_ret'] = float(value.replace('%', ''))
-                    elif '未敲入未敲出收益' in header:
-                        params['ret2'] = float(value.replace('%', ''))
-                    elif '敲入未敲出收益' in header:
-                        params['ret1'] = float(value.replace('%', ''))
-                    elif '敲出收益' in header and not '敲入' in header:
-                        params['ret3'] = float(value.replace('%', ''))
-                    elif '参与率' in header:
-                        params['participation_rate'] = float(value.replace('%', ''))
-                    elif '最高收益' in header:
-                        params['max_ret'] = float(value.replace('%', ''))
-                    elif '管理费' in header or '期权费' in header:
-                        params['cost'] = float(value.replace('%', '').split('/')[0])
-            
-            # 根据结构类型自动切换期权类型
-            if structure_type:
-                # 定义结构类型到选项类型的映射
-                structure_mapping = {
-                    '三元': '三元小雪球',
-                    '看涨敲出': '看涨敲出',
-                    '看涨香草': '看涨香草',
-                    '单鲨': lambda: '看涨单鲨/价差' if '看涨' in structure_type else '看跌单鲨/价差',
-                    '价差': lambda: '看涨单鲨/价差' if '看涨' in structure_type else '看跌单鲨/价差'
-                }
-                
-                # 查找匹配的结构类型
-                matched_type = None
-                for key in structure_mapping:
-                    if key in structure_type:
-                        if callable(structure_mapping[key]):
-                            matched_type = structure_mapping[key]()
-                        else:
-                            matched_type = structure_mapping[key]
-                        break
-                
-                if matched_type and matched_type in self.option_types:
-                    self.type_combo.setCurrentText(matched_type)
-                    self.current_option = matched_type
-                    # 更新控件
-                    self.create_parameter_controls()
-            
-            # 更新当前选项的参数
-            if params:
-                current_params = self.option_types[self.current_option]['params']
-                for key, value in params.items():
-                    if key in current_params:
-                        current_params[key] = value
-                        # 更新对应的控件
-                        edit = getattr(self, f"{key}_edit", None)
-                        if edit is not None:
-                            if isinstance(value, (float, int)):
-                                edit.setText(f"{value}")
-                            else:
-                                edit.setText(value)
-                
-                # 更新图表
-                self.update_plot()
-                self.copy_to_clipboard()
+                with tracing.span('parse'):
+                    structure_type, params = parse_row(lines[0].split('\t'), lines[1].split('\t'))
+            self.apply_parsed(structure_type, params)
                 
         except Exception as e:
             print(f"解析参数时出错: {e}")
 
+    def open_file(self):
+        """从TSV/CSV/XLSX文件读取第一条产品并更新界面（只读到该行，不加载整个文件）"""
+        path, _ = QFileDialog.getOpenFileName(self, "打开参数表", "", "参数表 (*.tsv *.txt *.csv *.xlsx *.xlsm)")
+        if not path:
+            return
+        try:
+            headers, rows = read_table(path)
+            first = next(rows, None)
+            rows.close()
+            if first is None:
+                print(f"文件中没有数据行: {path}")
+                return
+            self.apply_parsed(*parse_row(headers, first[1]))
+        except Exception as e:
+            print(f"读取文件时出错: {e}")
+
+    def apply_parsed(self, structure_type, params):
+        """切换到解析出的结构类型，写入参数，然后重绘并复制"""
+        # 根据结构类型自动切换期权类型（change_option_type会切换参数面板）
+        matched_type = match_option_type(structure_type)
+        if matched_type and matched_type in self.option_types:
+            self.type_combo.setCurrentText(matched_type)
+        
+        # 更新当前选项的参数
+        if params:
+            current_params = self.option_types[self.current_option]['params']
+            for key, value in params.items():
+                if key in current_params:
+                    current_params[key] = value
+                    # 更新对应的控件
+                    edit = getattr(self, f"{key}_edit", None)
+                    if edit is not None:
+                        if isinstance(value, (float, int)):
+                            edit.setText(f"{value}")
+                        else:
+                            edit.setText(value)
+            
+            # 更新图表
+            self.update_plot()
+            self.copy_to_clipboard()
+
     def create_parameter_controls(self):
-        # 1. 清除所有控件
-        while self.control_layout.count():
-            item = self.control_layout.takeAt(0)  # 取出第一个 item
-            if item.widget():
-                item.widget().deleteLater()  # 删除 widget
-            elif item.layout():
-                # 递归删除子布局中的控件
-                sub_layout = item.layout()
-                while sub_layout.count():
-                    sub_item = sub_layout.takeAt(0)
-                    if sub_item.widget():
-                        sub_item.widget().deleteLater()
-                sub_layout.deleteLater()
-        
-        # 根据当前期权类型创建控件
-        params = self.option_types[self.current_option]['params']
-        
-        # 创建参数输入控件
-        if 'strike' in params:
-            self.strike_edit = self.create_parameter_input(self.control_layout, "行权价(%)", params['strike'])
-        if 'knock_in' in params:
-            self.knock_in_edit = self.create_parameter_input(self.control_layout, "敲入价(%)", params['knock_in'])
-        if 'knock_out' in params:
-            self.knock_out_edit = self.create_parameter_input(self.control_layout, "敲出价(%)", params['knock_out'])
-        if 'participation_rate' in params:
-            self.participation_rate_edit = self.create_parameter_input(self.control_layout, "参与率(%)", params['participation_rate'])
-        if 'min_ret' in params:
-            self.min_ret_edit = self.create_parameter_input(self.control_layout, "最低收益(%)", params['min_ret'])
-        if 'max_ret' in params:
-            self.max_ret_edit = self.create_parameter_input(self.control_layout, "最高收益(%)", params['max_ret'])
-        if 'knock_ret' in params:
-            self.knock_ret_edit = self.create_parameter_input(self.control_layout, "敲出收益(%)", params['knock_ret'])
-        if 'ret1' in params:
-            self.ret1_edit = self.create_parameter_input(self.control_layout, "保底收益(%)", params['ret1'])
-        if 'ret2' in params:
-            self.ret2_edit = self.create_parameter_input(self.control_layout, "中间收益(%)", params['ret2'])
-        if 'ret3' in params:
-            self.ret3_edit = self.create_parameter_input(self.control_layout, "敲出收益(%)", params['ret3'])
-        
-        self.month_edit = self.create_parameter_input(self.control_layout, "期限", params['month'], is_str=True)
-        self.asset_edit = self.create_parameter_input(self.control_layout, "标的资产", params['asset'], is_str=True)
-        self.cost_edit = self.create_parameter_input(self.control_layout, "费率(%)", params['cost'])
-        
-        if 'type' in params:
-            self.type_edit = QComboBox()
-            self.type_edit.addItems(['单鲨', '价差'])
-            self.type_edit.setCurrentText(params['type'])
-            form_layout = QFormLayout()
-            form_layout.addRow(QLabel("单鲨/价差"), self.type_edit)
-            self.control_layout.addLayout(form_layout)
+        # 每种结构的参数面板只创建一次并缓存在QStackedWidget中，切换结构时只翻页并同步数值
+        self.panels = {}
+        self.panel_stack = QStackedWidget()
+        self.control_layout.addWidget(self.panel_stack)
 
         # 在最后添加一个拉伸因子，使所有控件靠上排列
         self.control_layout.addStretch()
 
         
-        # 在最后添加"更新并复制"按钮
+        # 在最后添加"更新并复制"按钮（各结构共用）
         self.update_copy_btn = QPushButton("更新并复制")
         self.update_copy_btn.setFont(self.font)
         self.update_copy_btn.clicked.connect(self.update_and_copy)
@@ -365,6 +349,72 @@ class OptionApp(QMainWindow):
         # 在布局中添加（但不显示）
         self.control_layout.insertWidget(self.control_layout.count()-1, self.copy_hint)
 
+        self.show_parameter_panel(self.current_option)
+
+    def build_parameter_panel(self, params):
+        page = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        page.setLayout(layout)
+        edits = {}
+        
+        # 创建参数输入控件
+        if 'strike' in params:
+            edits['strike'] = self.create_parameter_input(layout, "行权价(%)", params['strike'])
+        if 'knock_in' in params:
+            edits['knock_in'] = self.create_parameter_input(layout, "敲入价(%)", params['knock_in'])
+        if 'knock_out' in params:
+            edits['knock_out'] = self.create_parameter_input(layout, "敲出价(%)", params['knock_out'])
+        if 'participation_rate' in params:
+            edits['participation_rate'] = self.create_parameter_input(layout, "参与率(%)", params['participation_rate'])
+        if 'min_ret' in params:
+            edits['min_ret'] = self.create_parameter_input(layout, "最低收益(%)", params['min_ret'])
+        if 'max_ret' in params:
+            edits['max_ret'] = self.create_parameter_input(layout, "最高收益(%)", params['max_ret'])
+        if 'knock_ret' in params:
+            edits['knock_ret'] = self.create_parameter_input(layout, "敲出收益(%)", params['knock_ret'])
+        if 'ret1' in params:
+            edits['ret1'] = self.create_parameter_input(layout, "保底收益(%)", params['ret1'])
+        if 'ret2' in params:
+            edits['ret2'] = self.create_parameter_input(layout, "中间收益(%)", params['ret2'])
+        if 'ret3' in params:
+            edits['ret3'] = self.create_parameter_input(layout, "敲出收益(%)", params['ret3'])
+        
+        edits['month'] = self.create_parameter_input(layout, "期限", params['month'], is_str=True)
+        edits['asset'] = self.create_parameter_input(layout, "标的资产", params['asset'], is_str=True)
+        edits['cost'] = self.create_parameter_input(layout, "费率(%)", params['cost'])
+        
+        if 'type' in params:
+            type_edit = QComboBox()
+            type_edit.addItems(['单鲨', '价差'])
+            type_edit.setCurrentText(params['type'])
+            type_edit.currentTextChanged.connect(self.schedule_preview)
+            form_layout = QFormLayout()
+            form_layout.addRow(QLabel("单鲨/价差"), type_edit)
+            layout.addLayout(form_layout)
+            edits['type'] = type_edit
+
+        layout.addStretch()
+        return page, edits
+
+    def show_parameter_panel(self, option_type):
+        panel = self.panels.get(option_type)
+        if panel is None:
+            panel = self.panels[option_type] = self.build_parameter_panel(self.option_types[option_type]['params'])
+            self.panel_stack.addWidget(panel[0])
+        page, edits = panel
+
+        # self.<key>_edit 指向当前面板的控件，并把面板隐藏期间参数的变化同步过来
+        params = self.option_types[option_type]['params']
+        for key, edit in edits.items():
+            setattr(self, f"{key}_edit", edit)
+            if key == 'type':
+                if edit.currentText() != params['type']:
+                    edit.setCurrentText(params['type'])
+            elif edit.text() != str(params[key]):
+                edit.setText(str(params[key]))
+        self.panel_stack.setCurrentWidget(page)
+
     def create_parameter_input(self, layout, label, default_value, is_str=False):
         form_layout = QFormLayout()
         label_widget = QLabel(label)
@@ -375,50 +425,114 @@ class OptionApp(QMainWindow):
             edit.setValidator(validator)
         form_layout.addRow(label_widget, edit)
         layout.addLayout(form_layout)
+        edit.textChanged.connect(self.schedule_preview)
         return edit
+
+    def toggle_tracing(self, checked):
+        tracing.enable(checked)
+        if checked and self.trace_label is None:
+            self.trace_label = QLabel()
+            export_btn = QPushButton("导出trace")
+            export_btn.clicked.connect(self.export_trace)
+            self.statusBar().addWidget(self.trace_label, 1)
+            self.statusBar().addPermanentWidget(export_btn)
+        if self.trace_label is not None:
+            self.statusBar().setVisible(checked)
+        if checked:
+            self.refresh_trace_status()
+            self.trace_timer.start()
+        else:
+            self.trace_timer.stop()
+
+    def refresh_trace_status(self):
+        self.trace_label.setText(tracing.format_summary())
+
+    def export_trace(self):
+        """把记录的追踪数据导出为Chrome trace（chrome://tracing 或 Perfetto打开）"""
+        path, _ = QFileDialog.getSaveFileName(self, "导出Chrome trace", "chart_trace.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            tracing.export_chrome_trace(path)
+        except OSError as e:
+            print(f"导出trace时出错: {e}")
+
+    def toggle_live_preview(self, checked):
+        if checked:
+            self.schedule_preview()
+        else:
+            self.update_plot()
+
+    def schedule_preview(self):
+        # 预览绘制不到1毫秒，每次输入直接重画，无需防抖
+        if self.live_preview_check.isChecked():
+            self.show_preview()
+
+    def show_preview(self):
+        try:
+            params = self.read_params()
+        except ValueError:
+            return  # 输入未完成（如空白或只有'-'）时保留上一次的预览
+        self.payoff_preview.set_product(self.current_option, params)
+        self.chart_stack.setCurrentWidget(self.payoff_preview)
     
     def change_option_type(self, option_type):
         self.current_option = option_type
-        # 更新控件
-        self.create_parameter_controls()
+        # 切换到该结构的参数面板
+        self.show_parameter_panel(option_type)
         # 更新图表
         self.update_plot()
     
+    def read_params(self):
+        """读取当前面板的输入，返回参数的副本；数值无效时抛出ValueError"""
+        params = dict(self.option_types[self.current_option]['params'])
+        for key in params.keys():
+            # 获取对应的编辑控件
+            edit = getattr(self, f"{key}_edit", None)
+            if edit is not None:
+                if key in ['strike', 'knock_out', 'knock_in', 'participation_rate', 'min_ret', 'max_ret', 'knock_ret', 'ret1', 'ret2', 'ret3', 'cost']:
+                    # 确保参与率等数值参数正确转换为浮点数
+                    text = edit.text().replace('%', '')  # 移除可能存在的百分号
+                    params[key] = float(text)
+                elif key in ['type']:
+                    params['type'] = self.type_edit.currentText()
+                else:
+                    # 处理字符串参数
+                    params[key] = edit.text()
+        return params
+
     def update_params(self):
         try:
-            params = self.option_types[self.current_option]['params']
-            for key in params.keys():
-                # 获取对应的编辑控件
-                edit = getattr(self, f"{key}_edit", None)
-                if edit is not None:
-                    if key in ['strike', 'knock_out', 'knock_in', 'participation_rate', 'min_ret', 'max_ret', 'knock_ret', 'ret1', 'ret2', 'ret3', 'cost']:
-                        # 确保参与率等数值参数正确转换为浮点数
-                        text = edit.text().replace('%', '')  # 移除可能存在的百分号
-                        params[key] = float(text)
-                    elif key in ['type']:
-                        params['type'] = self.type_edit.currentText()
-                    else:
-                        # 处理字符串参数
-                        params[key] = edit.text()
-            
+            self.option_types[self.current_option]['params'].update(self.read_params())
             return True
         except ValueError as e:
             print(f"参数更新错误: {e}")
             return False
     
     def update_plot(self):
-        if not self.update_params():
+        with tracing.span('update_params'):
+            updated = self.update_params()
+        if not updated or self.canvas is None:
             return
-        
-        # 清除当前图形
-        self.ax.clear()
-        
-        # 调用对应的绘图函数
-        plot_func = self.option_types[self.current_option]['plot_func']
-        plot_func()
+        self.chart_stack.setCurrentWidget(self.canvas)
+
+        if self.render_mode == 'blit':
+            # 只更新图元数据并局部重绘
+            with tracing.span('blit_update'):
+                self.blit_chart.update(self.current_option, self.option_types[self.current_option]['params'])
+            return
+
+        with tracing.span('plot'):
+            # 清除当前图形
+            self.ax.clear()
+
+            # 调用对应的绘图函数
+            plot_func = self.option_types[self.current_option]['plot_func']
+            plot_func()
         
         # 重绘图形
-        self.canvas.draw()
+        with tracing.span('canvas.draw'):
+            self.canvas.draw()
     
     def plot_sharkfin_call(self):
         # 获取当前参数
@@ -483,7 +597,7 @@ class OptionApp(QMainWindow):
         self.ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
         
         # 调整布局确保图形大小固定
-        self.figure.tight_layout()
+        fit_layout(self.figure, self.ax, self.current_option)
 
     def plot_sharkfin_put(self):
         # 获取当前参数
@@ -549,7 +663,7 @@ class OptionApp(QMainWindow):
         self.ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
         
         # 调整布局确保图形大小固定
-        self.figure.tight_layout()
+        fit_layout(self.figure, self.ax, self.current_option)
     
     def plot_snowball(self):
         # 获取当前参数
@@ -608,7 +722,7 @@ class OptionApp(QMainWindow):
         self.ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
         
         # 调整布局确保图形大小固定
-        self.figure.tight_layout()
+        fit_layout(self.figure, self.ax, self.current_option)
 
     def plot_snowball2(self):
         # 获取当前参数
@@ -655,7 +769,7 @@ class OptionApp(QMainWindow):
         self.ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
 
         # 调整布局确保图形大小固定
-        self.figure.tight_layout()
+        fit_layout(self.figure, self.ax, self.current_option)
 
     def plot_call(self):
         # 获取当前参数
@@ -711,35 +825,28 @@ class OptionApp(QMainWindow):
         self.ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
 
         # 调整布局确保图形大小固定
-        self.figure.tight_layout()
+        fit_layout(self.figure, self.ax, self.current_option)
 
     def copy_to_clipboard(self):
-        # 将图表保存为图像
-        buf = io.BytesIO()
-        self.figure.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        
-        # 创建QPixmap并复制到剪贴板
-        image = QImage()
-        image.loadFromData(buf.getvalue())
-        pixmap = QPixmap.fromImage(image)
-        
-        clipboard = QApplication.clipboard()
-        clipboard.setPixmap(pixmap)
-        
-        buf.close()
+        if self.canvas is None:
+            return
+        with tracing.span('copy'):
+            # 直接包装画布的RGBA渲染缓冲区，不做PNG编码/解码；update_plot已同步绘制完毕
+            buf = self.canvas.buffer_rgba()
+            height, width = buf.shape[:2]
+            image = QImage(buf, width, height, width * 4, QImage.Format_RGBA8888)
+
+            # 缓冲区归matplotlib所有，下次重绘会被覆盖，交给剪贴板前拷贝一份（仅内存拷贝）
+            # 粘贴方需要PNG等格式时由Qt按需转换
+            clipboard = QApplication.clipboard()
+            clipboard.setImage(image.copy())
 
         self.copy_hint.setVisible(True)  # 显示提示
         QTimer.singleShot(800, lambda: self.copy_hint.setVisible(False))  # 1秒后隐藏
 
 
 if __name__ == "__main__":
-    # 设置matplotlib中文字体
-    plt.rcParams['font.family'] = ['SimHei']
-    plt.rcParams['axes.unicode_minus'] = False
-    plt.rcParams['axes.edgecolor'] = 'grey'  # 坐标轴边框颜色设为灰色
-    plt.rcParams['axes.linewidth'] = 1.0     # 坐标轴边框线宽设为 1.0
-    
+    # matplotlib中文字体等样式在init_chart中通过apply_style设置
     app = QApplication(sys.argv)
     window = OptionApp()
     window.show()
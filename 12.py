@@ -1,236 +1,18 @@
 import streamlit as st
-import sys
-import io
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
 from copy import deepcopy
-import matplotlib.pyplot as plt
-import numpy as np
-import matplotlib.font_manager as fm
-
-# 加载 ttf 字体
-my_font = fm.FontProperties(fname='SimHei.ttf')
-
-# 获取字体名，并设置到 rcParams 中
-plt.rcParams['font.sans-serif'] = [my_font.get_name()]
-plt.rcParams['axes.unicode_minus'] = False
-plt.rcParams['axes.edgecolor'] = 'grey'
-plt.rcParams['axes.linewidth'] = 1.0
-
-print("当前字体名：", my_font.get_name())
-# --- PLOTTING FUNCTIONS ---
-# Each function now takes the matplotlib axes object `ax` and `params` dictionary as arguments.
-
-def plot_sharkfin_call(ax, params):
-    strike = params['strike']
-    knock_out = params['knock_out']
-    participation_rate = params['participation_rate']
-    min_ret = params['min_ret']
-    max_ret = params['max_ret']
-    knock_ret = params['knock_ret']
-    month = params['month']
-    asset = params['asset']
-    cost = params['cost']
-    type0 = params['type']
-    
-    ax.set_ylim(-1, max_ret + 2)
-    
-    ax.plot([strike * 0.9, strike, knock_out], [min_ret, min_ret, max_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    
-    ax.plot([knock_out, knock_out * 1.05], [knock_ret, knock_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    
-    for x, y in zip([strike * 0.9, strike, knock_out], [min_ret, min_ret, max_ret]):
-        ax.text(x, y + 0.1, f'{y:.2f}%', ha='center', va='bottom', color='black', fontsize=12)
-    
-    ax.text((strike + knock_out) / 2 - 0.5, max_ret / 2 + 0.2, f'参与率{participation_rate:,.1f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    if type0 == '单鲨':
-        ax.text(knock_out * 1.01, knock_ret + 0.3, f'敲出{knock_ret:,.2f}%',
-                ha='left', va='center', color='black', fontsize=12)
-    
-    ax.set_xlabel('标的期末价格/期初价格', ha='right', fontsize=10, labelpad=15)
-    ax.set_xticks([strike, knock_out])
-    ax.set_xticklabels([f'{strike:g}%', f'{knock_out:g}%'], fontsize=11)
-    ax.set_yticks([min_ret, max_ret])
-    ax.set_yticklabels([f'{min_ret}%', f'{max_ret}%'], fontsize=11)
-    
-    title_text = f'{month}美式看涨单鲨（每日观察）-{asset}' if type0 == '单鲨' else f'{month}欧式看涨价差（期末观察一次）-{asset}'
-    ax.set_title(f'{title_text}\n业绩报酬计提基准（年化)-费率{cost}%',
-                 fontsize=14, pad=20, color='#2C3E50')
-    
-    ax.grid(linestyle=':', alpha=0.5, axis='both')
-    ax.axhline(0, color='black', linewidth=0.8)
-    ax.axvline(100, color='black', linewidth=0.8)
-    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
-
-def plot_sharkfin_put(ax, params):
-    strike = params['strike']
-    knock_out = params['knock_out']
-    participation_rate = params['participation_rate']
-    min_ret = params['min_ret']
-    max_ret = params['max_ret']
-    knock_ret = params['knock_ret']
-    month = params['month']
-    asset = params['asset']
-    cost = params['cost']
-    type0 = params['type']
-
-    ax.set_ylim(-1, max_ret + 2)
-
-    ax.plot([knock_out * 0.9, knock_out], [knock_ret, knock_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([knock_out, strike], [max_ret, min_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([strike, strike * 1.1], [min_ret, min_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-
-    for x, y in zip([knock_out, strike, strike*1.1], [max_ret, min_ret, min_ret]):
-        ax.text(x, y + 0.1, f'{y:.2f}%', ha='center', va='bottom', color='black', fontsize=12)
-
-    ax.text((strike + knock_out) / 2, max_ret * 2 / 3, f'参与率{participation_rate:.1f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    if type0 == '单鲨':
-        ax.text(knock_out * 0.95, knock_ret * 1.1, f'敲出{knock_ret:,.2f}%',
-                ha='left', va='center', color='black', fontsize=12)
-
-    ax.set_xlabel('标的期末价格/期初价格', ha='right', fontsize=10, labelpad=10)
-    ax.set_xticks([strike, knock_out])
-    ax.set_xticklabels([f'{strike:g}%', f'{knock_out:g}%'], fontsize=11)
-    ax.set_yticks([min_ret, max_ret])
-    ax.set_yticklabels([f'{min_ret:g}%', f'{max_ret:g}%'], fontsize=11)
-
-    opt_title = '美式看跌单鲨（每日观察）' if type0 == '单鲨' else '欧式看跌价差（期末观察一次）'
-    ax.set_title(f'{month} {opt_title}-{asset}\n业绩报酬计提基准（年化)-费率{cost}%',
-                 fontsize=14, pad=20, color='#2C3E50')
-
-    ax.grid(linestyle=':', alpha=0.5, axis='both')
-    ax.axhline(0, color='black', linewidth=0.8)
-    ax.axvline(100, color='black', linewidth=0.8)
-    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
-
-def plot_snowball(ax, params):
-    knock_in = params['knock_in']
-    knock_out = params['knock_out']
-    ret1 = params['ret1']
-    ret2 = params['ret2']
-    ret3 = params['ret3']
-    month = params['month']
-    asset = params['asset']
-    cost = params['cost']
-    
-    ax.set_ylim(-1, ret3 + 2)
-    
-    ax.plot([knock_in * 0.8, knock_in], [ret1, ret1],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([knock_in, knock_out], [ret2, ret2],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([knock_out, knock_out * 1.2], [ret3, ret3],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-
-    ax.text(knock_in * 0.8, ret1 + 0.5, f'保底收益{ret1:,.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    ax.text(knock_in + 3, ret2 + 0.5, f'未敲入未敲出收益{ret2:,.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    ax.text(knock_out * 1.05, ret3 + 0.5, f'敲出收益{ret3:,.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    
-    ax.set_xlabel('敲出观察日价格/期初价格', ha='left', fontsize=10, labelpad=15)
-    ax.set_xticks([knock_in, knock_out])
-    ax.set_xticklabels([f'{knock_in}%', f'{knock_out}%'], fontsize=11)
-    ax.set_yticks([ret1, ret2, ret3])
-    ax.set_yticklabels([f'{ret1}%', f'{ret2}%', f'{ret3}%'], fontsize=11)
-
-    ax.set_title(f'{month}三元小雪球（每月观察敲出）-{asset}\n业绩报酬计提基准（年化)-费率{cost}%',
-                 fontsize=14, pad=20, color='#2C3E50')
-
-    ax.grid(linestyle=':', alpha=0.5, axis='both')
-    ax.axhline(0, color='black', linewidth=0.8)
-    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
-
-def plot_snowball2(ax, params):
-    knock_in = params['knock_in']
-    knock_out = params['knock_out']
-    ret1 = params['ret1']
-    ret3 = params['ret3']
-    month = params['month']
-    asset = params['asset']
-    cost = params['cost']
-
-    ax.set_ylim(-1, ret3 + 2)
-
-    ax.plot([knock_in * 0.9, knock_out], [ret1, ret1],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([knock_out, knock_out * 1.2], [ret3, ret3],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-
-    ax.text(knock_in * 0.95, ret1 + 0.5, f'未敲出收益{ret1:,.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    ax.text(knock_out * 1.05, ret3 + 0.5, f'敲出收益{ret3:,.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    
-    ax.set_xlabel('敲出观察日价格/期初价格', ha='left', fontsize=10, labelpad=15)
-    ax.set_xticks([knock_out])
-    ax.set_xticklabels([f'{knock_out}%'], fontsize=12)
-    ax.set_yticks([ret1, ret3])
-    ax.set_yticklabels([f'{ret1}%', f'{ret3}%'], fontsize=11)
-
-    ax.set_title(f'{month}看涨敲出（期末观察一次）-{asset}\n业绩报酬计提基准（年化)-费率{cost}%',
-                 fontsize=14, pad=20, color='#2C3E50')
-    ax.grid(linestyle=':', alpha=0.5, axis='both')
-    ax.axhline(0, color='black', linewidth=0.8)
-    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
-
-def plot_call(ax, params):
-    strike = params['strike']
-    participation_rate = params['participation_rate']
-    min_ret = params['min_ret']
-    month = params['month']
-    asset = params['asset']
-    cost = params['cost']
-
-    rise1 = 1.1
-    ret1 = min_ret + participation_rate * (rise1 - 1)
-    rise2 = 1.15
-    ret2 = min_ret + participation_rate * (rise2 - 1)
-    
-    ax.set_ylim(-1, ret2 + 2)
 
-    ax.plot([strike * 0.9, strike], [min_ret, min_ret],
-            marker='o', linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
-    ax.plot([strike, strike * rise1, strike * rise2], [min_ret, ret1, ret2],
-            linestyle='-', color='#FF6B6B',
-            linewidth=2, markersize=5)
+import tracing
 
-    for x, y in zip([strike * 0.9, strike], [min_ret, min_ret]):
-        ax.text(x, y + 0.1, f'{y:.2f}%', ha='center', va='bottom', color='black', fontsize=12)
+from chart_cache import ChartCache, chart_key
+from ingest import read_table
+from option_charts import get_initial_data, match_option_type, parse_row
+from render_pool import RenderPool
 
-    ax.text((strike + rise2 * 100) / 2, ret2 / 2, f'参与率{participation_rate:.2f}%',
-            ha='left', va='center', color='black', fontsize=12)
-    
-    ax.set_xlabel('标的期末价格/期初价格', ha='right', fontsize=10, labelpad=15)
-    ax.set_xticks([strike])
-    ax.set_xticklabels([f'{strike}%'], fontsize=11)
-    ax.set_yticks([min_ret])
-    ax.set_yticklabels([f'{min_ret}%'], fontsize=11)
-
-    ax.set_title(f'{month}看涨香草-{asset}\n业绩报酬计提基准（年化)-费率{cost}%',
-                 fontsize=14, pad=20, color='#2C3E50')
-
-    ax.grid(linestyle=':', alpha=0.5, axis='both')
-    ax.axhline(0, color='black', linewidth=0.8)
-    ax.axvline(100, color='black', linewidth=0.8)
-    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
+# matplotlib is only imported by the render workers, which register the font
+# once each (render_pool._init_worker); reruns of this script stay cheap.
 
 # --- PARSING LOGIC ---
 def parse_parameters(text):
@@ -247,98 +29,46 @@ def parse_parameters(text):
         headers = lines[0].split('\t')
         values = lines[1].split('\t')
         
-        parsed_params = {}
-        structure_type_str = None
-
-        for header, value in zip(headers, values):
-            header = header.strip().lower()
-            value = value.strip()
-            
-            if not value or value == '-': continue
-
-            if '结构' in header:
-                structure_type_str = value
-            elif '标的' in header:
-                parsed_params['asset'] = value
-            elif '期限' in header:
-                parsed_params['month'] = value.replace('天', 'D').replace('月', 'M')
-            elif '行权价' in header:
-                parsed_params['strike'] = float(value.replace('%', ''))
-            elif '障碍价' in header or '敲出价' in header:
-                parsed_params['knock_out'] = float(value.replace('%', ''))
-            elif '敲入价' in header:
-                parsed_params['knock_in'] = float(value.replace('%', ''))
-            elif '保底年化收益' in header and not '期权' in header:
-                parsed_params['min_ret'] = float(value.replace('%', ''))
-            elif '敲出年化收益' in header and not '期权' in header:
-                parsed_params['knock_ret'] = float(value.replace('%', ''))
-            elif '未敲入未敲出收益' in header:
-                parsed_params['ret2'] = float(value.replace('%', ''))
-            elif '敲入未敲出收益' in header:
-                parsed_params['ret1'] = float(value.replace('%', ''))
-            elif '敲出收益' in header and not '敲入' in header:
-                parsed_params['ret3'] = float(value.replace('%', ''))
-            elif '参与率' in header:
-                parsed_params['participation_rate'] = float(value.replace('%', ''))
-            elif '最高收益' in header:
-                parsed_params['max_ret'] = float(value.replace('%', ''))
-            elif '管理费' in header or '期权费' in header:
-                parsed_params['cost'] = float(value.replace('%', '').split('/')[0])
-        
-        # Determine and switch option type
-        if structure_type_str:
-            structure_mapping = {
-                '三元': '三元小雪球', '看涨敲出': '看涨敲出', '看涨香草': '看涨香草',
-                '单鲨': '看涨单鲨/价差' if '看涨' in structure_type_str else '看跌单鲨/价差',
-                '价差': '看涨单鲨/价差' if '看涨' in structure_type_str else '看跌单鲨/价差'
-            }
-            matched_type = None
-            for key, type_name in structure_mapping.items():
-                if key in structure_type_str:
-                    matched_type = type_name
-                    break
-            
-            if matched_type and matched_type in st.session_state.option_types:
-                st.session_state.current_option = matched_type
-
-        # Update params for the current (possibly new) option type
-        current_params_dict = st.session_state.option_types[st.session_state.current_option]['params']
-        for key, value in parsed_params.items():
-            if key in current_params_dict:
-                current_params_dict[key] = value
-        
+        with tracing.span('parse'):
+            apply_parsed(*parse_row(headers, values))
         st.toast("参数解析成功！")
 
     except Exception as e:
         st.error(f"解析参数时出错: {e}")
 
+def parse_file(uploaded):
+    """Reads the first product of an uploaded TSV/CSV/XLSX file into the session state.
 
-# --- INITIAL DATA & SESSION STATE ---
+    Rows are streamed (see ingest), so only the header and that row are read.
+    """
+    try:
+        headers, rows = read_table(uploaded)
+        first = next(rows, None)
+        rows.close()
+        if first is None:
+            st.error("文件中没有数据行。")
+            return
+        apply_parsed(*parse_row(headers, first[1]))
+        st.toast(f"已读取文件第{first[0]}行！")
+
+    except Exception as e:
+        st.error(f"读取文件时出错: {e}")
 
-def get_initial_data():
-    """Returns the initial dictionary of option types and their parameters."""
-    return {
-        '看涨单鲨/价差': {
-            'params': {'strike': 102.0, 'knock_out': 108.0, 'participation_rate': 49.2, 'min_ret': 1.8, 'max_ret': 4.38, 'knock_ret': 1.8, 'month': '2025-07', 'asset': '沪深300指数', 'cost': 0.42, 'type': '单鲨'},
-            'plot_func': plot_sharkfin_call
-        },
-        '看跌单鲨/价差': {
-            'params': {'strike': 100.0, 'knock_out': 90.0, 'participation_rate': 42.0, 'min_ret': 1.0, 'max_ret': 5.2, 'knock_ret': 2.25, 'month': '3M', 'asset': '黄金现货9999', 'cost': 0.42, 'type': '单鲨'},
-            'plot_func': plot_sharkfin_put
-        },
-        '三元小雪球': {
-            'params': {'knock_in': 80.0, 'knock_out': 100.0, 'ret1': 0.2, 'ret2': 4.0, 'ret3': 4.2, 'month': '24M', 'asset': '中证1000', 'cost': 0.42},
-            'plot_func': plot_snowball
-        },
-        '看涨敲出': {
-            'params': {'knock_in': 100.0, 'knock_out': 101.0, 'ret1': 0.2, 'ret3': 4.15, 'month': '6M', 'asset': '黄金9999', 'cost': 0.22},
-            'plot_func': plot_snowball2
-        },
-        '看涨香草': {
-            'params': {'strike': 100.0, 'participation_rate': 37.0, 'min_ret': 0.05, 'month': '10M', 'asset': '中证1000', 'cost': 0.42},
-            'plot_func': plot_call
-        }
-    }
+def apply_parsed(structure_type_str, parsed_params):
+    """Switches to the parsed option type and copies the parsed params into it."""
+    # Determine and switch option type
+    matched_type = match_option_type(structure_type_str)
+    if matched_type and matched_type in st.session_state.option_types:
+        st.session_state.current_option = matched_type
+
+    # Update params for the current (possibly new) option type
+    current_params_dict = st.session_state.option_types[st.session_state.current_option]['params']
+    for key, value in parsed_params.items():
+        if key in current_params_dict:
+            current_params_dict[key] = value
+
+
+# --- INITIAL DATA & SESSION STATE ---
 
 def initialize_state():
     """Initializes session state on the first run."""
@@ -349,6 +79,66 @@ def initialize_state():
         st.session_state.initialized = True
         st.session_state.parse_text = ""
 
+# --- CHART RENDERING ---
+
+FIGSIZE = (8, 6)
+DPI = 200  # matches what st.pyplot used to rasterise at
+
+@st.cache_resource
+def get_chart_cache():
+    """One cache per server process, shared by every session."""
+    max_mb = int(os.environ.get('CHART_CACHE_MB', '64'))
+    disk_mb = int(os.environ.get('CHART_CACHE_DISK_MB', '512'))
+    return ChartCache(max_bytes=max_mb * 1024 * 1024,
+                      disk_dir=os.environ.get('CHART_CACHE_DIR') or None,
+                      disk_max_bytes=disk_mb * 1024 * 1024)
+
+@st.cache_resource
+def get_render_pool():
+    """Worker processes shared by every session; matplotlib never runs in script threads."""
+    workers = int(os.environ.get('RENDER_WORKERS', '0')) or None
+    max_pending = int(os.environ.get('RENDER_QUEUE', '0')) or None
+    figure_mb = int(os.environ.get('FIGURE_BUDGET_MB', '64'))
+    pool = RenderPool(workers=workers, max_pending=max_pending,
+                      figure_bytes=figure_mb * 1024 * 1024)
+    pool.warm_up()
+    return pool
+
+RENDER_TIMEOUT = 30  # seconds to wait for a free render slot
+
+def render_png(option_type, params):
+    """Returns the PNG for one product, rendering it only on a cache miss."""
+    key = chart_key(option_type, params, FIGSIZE, DPI)
+
+    def render():
+        with tracing.span('pool.render'):
+            return get_render_pool().render(option_type, params, FIGSIZE, dpi=DPI,
+                                            timeout=RENDER_TIMEOUT, bbox_inches='tight')
+
+    with tracing.span('render_png'):
+        return get_chart_cache().get_or_render(key, render)
+
+def show_trace_panel():
+    """Debug expander with per-stage percentiles; only shown when CHART_TRACE=1.
+
+    Spans are process-wide, so the numbers cover every session on this server.
+    Render workers keep their own spans; here a cache miss shows up as pool.render.
+    """
+    with st.expander("🔍 性能追踪 (调试)"):
+        figures = get_render_pool().figure_stats()
+        st.caption(f"渲染进程图形: {figures['figures']}个, {figures['bytes'] / 2**20:.1f} MB"
+                   f"（已上报{figures['workers']}个进程，每进程上限"
+                   f"{figures['max_bytes_per_worker'] / 2**20:.0f} MB）")
+        stats = tracing.summary()
+        if not stats:
+            st.caption("暂无追踪数据")
+            return
+        st.table([{'阶段': name, '次数': s['count'],
+                   **{f'{q} (ms)': round(s[q], 2) for q in ('p50', 'p90', 'p99', 'max')}}
+                  for name, s in stats.items()])
+        st.download_button("导出Chrome trace", data=json.dumps(tracing.chrome_trace()),
+                           file_name="chart_trace.json", mime="application/json")
+
 # --- MAIN APP ---
 
 def main():
@@ -413,21 +203,31 @@ def main():
             # After parsing, we rerun the script to ensure all widgets are updated
             st.rerun()
 
+        uploaded = st.file_uploader("或上传参数表文件 (TSV/CSV/XLSX，读取第一条产品)",
+                                    type=['tsv', 'txt', 'csv', 'xlsx', 'xlsm'])
+        # The uploader keeps its file across reruns; apply each upload only once
+        if uploaded is not None and st.session_state.get('parsed_file_id') != uploaded.file_id:
+            st.session_state.parsed_file_id = uploaded.file_id
+            parse_file(uploaded)
+            st.rerun()
+
     # --- Plotting Area ---
     col1, col2 = st.columns([5, 1]) # Create columns to align plot and download button
     
     with col1:
-        # Create the plot
-        fig, ax = plt.subplots(figsize=(8, 6))
-        
-        # Get the current plotting function and parameters from session state
-        plot_func = st.session_state.option_types[st.session_state.current_option]['plot_func']
+        # Get the current parameters from session state
         current_params = st.session_state.option_types[st.session_state.current_option]['params']
-        
-        # Execute the plotting function
-        plot_func(ax, current_params)
-        fig.tight_layout()
-        st.pyplot(fig)
+
+        # Identical products are rendered once and served from the shared cache
+        try:
+            st.image(render_png(st.session_state.current_option, current_params))
+        except TimeoutError:
+            st.warning("当前渲染请求较多，请稍后刷新重试。")
+        except BrokenProcessPool:
+            st.error("渲染进程异常退出，请刷新重试。")
+
+    if tracing.is_enabled():
+        show_trace_panel()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""Headless batch renderer: turns every row of a shelf file into a chart.
+
+Usage:
+    python batch_render.py shelf.tsv|shelf.csv|shelf.xlsx -o charts/ [--workers N] [--format png] [--dpi 100]
+                           [--engine matplotlib|template]
+
+The first line of the file is the header row, exactly as pasted into the apps.
+Rows are streamed from the file (see ingest) and spread over a process pool in
+chunks, with only a few chunks in flight at a time, so memory does not depend
+on the size of the file. Each worker owns a single Agg figure that it clears
+and reuses for every row it is handed. A failing row is recorded in
+`errors.tsv` in the output directory and does not stop the rest of the batch.
+
+With `--engine template`, SVG charts are filled into precompiled per-structure
+templates (svg_export) instead of going through matplotlib, which is several
+hundred times faster per chart; other formats still use matplotlib.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from ingest import read_table, row_params
+from option_charts import apply_style, get_initial_data, new_figure, render_chart, safe_filename
+from svg_export import export_chart
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(headers, out_dir, fmt, dpi, figsize, engine='matplotlib'):
+    import matplotlib
+    matplotlib.use('Agg')
+    apply_style()
+    _worker.update(
+        headers=headers, out_dir=out_dir, fmt=fmt, dpi=dpi, figsize=figsize, engine=engine,
+        defaults=get_initial_data(), fig=new_figure(figsize),
+    )
+
+
+def render_row(row_no, values):
+    """Renders one data row with the worker's figure; returns (row_no, path, error)."""
+    try:
+        option_type, params = row_params(_worker['headers'], values, _worker['defaults'])
+        if _worker['engine'] == 'template':
+            data = export_chart(option_type, params, fmt=_worker['fmt'], figsize=_worker['figsize'],
+                                dpi=_worker['dpi'], fig=_worker['fig'])
+        else:
+            data = render_chart(_worker['fig'], option_type, params,
+                                fmt=_worker['fmt'], dpi=_worker['dpi'])
+        name = safe_filename(f"{row_no:04d}_{option_type}_{params['month']}_{params['asset']}")
+        path = os.path.join(_worker['out_dir'], f"{name}.{_worker['fmt']}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return row_no, path, None
+    except Exception as e:
+        return row_no, None, f"{type(e).__name__}: {e}"
+
+
+def _render_chunk(rows):
+    return [render_row(row_no, values) for row_no, values in rows]
+
+
+def render_batch(headers, rows, out_dir, workers=None, fmt='png', dpi=100, figsize=(8, 6),
+                 chunksize=16, engine='matplotlib'):
+    """Renders all rows over a process pool and returns the results sorted by row number.
+
+    `rows` may be any iterable, including a generator over a file that does not
+    fit in memory: at most 2 × workers chunks of rows are queued at once.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    rows = iter(rows)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(headers, out_dir, fmt, dpi, figsize, engine)) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(rows, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_render_chunk, chunk))
+            if not pending:
+                break
+            results.extend(pending.popleft().result())
+    return sorted(results)
+
+
+def write_error_report(results, out_dir):
+    """Writes failed rows to errors.tsv and returns its path, or None if every row succeeded."""
+    failed = [(row_no, error) for row_no, _, error in results if error]
+    if not failed:
+        return None
+    path = os.path.join(out_dir, 'errors.tsv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('行号\t错误\n')
+        for row_no, error in failed:
+            f.write(f"{row_no}\t{error}\n")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成期权结构图")
+    parser.add_argument('input', help="包含表头行的TSV/CSV/XLSX文件")
+    parser.add_argument('-o', '--out-dir', default='charts')
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--format', default='png', choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--engine', default='matplotlib', choices=['matplotlib', 'template'],
+                        help="template: SVG直接由预编译模板生成（其他格式仍用matplotlib）")
+    args = parser.parse_args(argv)
+
+    headers, rows = read_table(args.input)
+    start = time.perf_counter()
+    results = render_batch(headers, rows, args.out_dir, workers=args.workers,
+                           fmt=args.format, dpi=args.dpi, engine=args.engine)
+    elapsed = time.perf_counter() - start
+
+    report = write_error_report(results, args.out_dir)
+    ok = sum(1 for _, _, error in results if error is None)
+    print(f"完成 {ok}/{len(results)} 行，用时 {elapsed:.1f}s")
+    if report:
+        print(f"失败 {len(results) - ok} 行，详见 {report}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
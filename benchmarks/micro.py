@@ -0,0 +1,241 @@
+"""Micro-benchmarks for the parse, plot, layout, encode and clipboard paths.
+
+Usage:
+    python benchmarks/micro.py [--save FILE] [--compare FILE] [--threshold 0.25]
+                               [-k SUBSTRING] [--no-qt] [--repeat 5] [--min-time 0.1]
+
+Every path is timed separately for each structure in get_initial_data():
+
+    parse/<type>             header + data row text -> (option type, params), as
+                             the apps' parse_parameters does it
+    plot_fresh/<type>        fig.clear(), a new axes and the plot function
+    plot_reused/<type>       ax.cla() and the plot function on the same axes
+    tight_layout/<type>      fig.tight_layout() on a plotted figure
+    fit_layout/<type>        the cached layout the apps use instead
+    savefig_png@<dpi>/<type> PNG encode of a plotted figure at 72, 100 and 200 dpi
+    copy/<type>              OptionApp.update_and_copy() on the offscreen Qt
+                             platform: redraw plus copy_to_clipboard
+
+A round calls the path enough times to take at least --min-time seconds; the
+fastest of --repeat rounds is the reported time per call (best) and is what
+comparisons use, as it is the least sensitive to background noise.
+
+--save writes the results as a JSON baseline. --compare reads one and exits
+with status 1 if any path is slower than baseline * (1 + threshold). Baselines
+are only meaningful on the machine that recorded them.
+"""
+import argparse
+import importlib.util
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from header_schema import HEADER_SCHEMA, STRUCTURE  # noqa: E402
+from option_charts import (PLOT_FUNCS, apply_style, fit_layout, get_initial_data,  # noqa: E402
+                           match_option_type, new_figure, parse_row)
+
+DPIS = (72, 100, 200)
+FIGSIZE = (8, 6)
+
+# 结构 cell text that parses back to each structure
+STRUCTURE_TEXT = {
+    '看涨单鲨/价差': '看涨单鲨', '看跌单鲨/价差': '看跌单鲨', '三元小雪球': '三元小雪球',
+    '看涨敲出': '看涨敲出', '看涨香草': '看涨香草',
+}
+
+
+def sheet_text(option_type, params):
+    """Header and data row, as pasted from a product sheet, for one product."""
+    headers, values = [], []
+    for rule in HEADER_SCHEMA:
+        if rule.field == STRUCTURE:
+            value = STRUCTURE_TEXT[option_type]
+        elif rule.field in params:
+            value = params[rule.field]
+            if rule.field == 'cost':
+                value = f"{value}%/年"
+            elif isinstance(value, float):
+                value = f"{value}%"
+        else:
+            continue
+        headers.append(rule.include[0])
+        values.append(str(value))
+    return '\t'.join(headers) + '\n' + '\t'.join(values)
+
+
+def parse_text(text):
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    structure_type, params = parse_row(lines[0].split('\t'), lines[1].split('\t'))
+    return match_option_type(structure_type), params
+
+
+def measure(func, repeat, min_time):
+    """Returns per-call seconds for each of `repeat` rounds of at least `min_time` seconds."""
+    func()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return number, rounds
+
+
+def chart_cases(data):
+    """Yields (name, func) for every matplotlib path of every structure."""
+    for option_type, spec in data.items():
+        params, plot = spec['params'], PLOT_FUNCS[option_type]
+        text = sheet_text(option_type, params)
+        assert parse_text(text)[0] == option_type, text
+        yield f"parse/{option_type}", lambda text=text: parse_text(text)
+
+        fig = new_figure(FIGSIZE)
+
+        def plot_fresh(fig=fig, plot=plot, params=params):
+            fig.clear()
+            plot(fig.add_subplot(111), params)
+        yield f"plot_fresh/{option_type}", plot_fresh
+
+        ax = new_figure(FIGSIZE).add_subplot(111)
+
+        def plot_reused(ax=ax, plot=plot, params=params):
+            ax.cla()
+            plot(ax, params)
+        yield f"plot_reused/{option_type}", plot_reused
+
+        # layout and encode run on a figure that is already plotted, whatever ran before
+        fig = new_figure(FIGSIZE)
+        ax = fig.add_subplot(111)
+        plot(ax, params)
+        yield f"tight_layout/{option_type}", fig.tight_layout
+        yield f"fit_layout/{option_type}", lambda fig=fig, ax=ax, t=option_type: fit_layout(fig, ax, t)
+
+        for dpi in DPIS:
+            yield (f"savefig_png@{dpi}/{option_type}",
+                   lambda fig=fig, dpi=dpi: fig.savefig(io.BytesIO(), format='png', dpi=dpi))
+
+
+def qt_cases(data):
+    """Yields (name, func) timing OptionApp.update_and_copy for every structure."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    spec = importlib.util.spec_from_file_location('app11', os.path.join(ROOT, '11.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    window = module.OptionApp()
+    window.show()
+    while window.canvas is None:
+        app.processEvents()
+
+    for option_type in data:
+        window.type_combo.setCurrentText(option_type)
+
+        def copy(window=window):
+            window.update_and_copy()
+            app.processEvents()
+        yield f"copy/{option_type}", copy
+
+
+def run(args):
+    data = get_initial_data()
+    cases = chart_cases(data)
+    if not args.no_qt:
+        # lazily: each copy case switches the window to its structure when it is reached
+        cases = itertools.chain(cases, qt_cases(data))
+    results = {}
+    for name, func in cases:
+        if args.k and not any(k in name for k in args.k):
+            continue
+        number, rounds = measure(func, args.repeat, args.min_time)
+        results[name] = {'best': min(rounds), 'median': statistics.median(rounds), 'number': number}
+        print(f"{name:<36}{min(rounds) * 1e3:>10.3f} ms{statistics.median(rounds) * 1e3:>10.3f} ms"
+              f"{number:>8}", flush=True)
+    return results
+
+
+def environment():
+    import matplotlib
+    import numpy
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'platform': platform.platform(), 'matplotlib': matplotlib.__version__,
+            'numpy': numpy.__version__}
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of every path against `baseline`; returns the regressed names."""
+    regressions = []
+    print(f"\n{'':<36}{'baseline':>13}{'now':>13}{'change':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36}{'-':>13}{result['best'] * 1e3:>10.3f} ms      new")
+            continue
+        change = result['best'] / base['best'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36}{base['best'] * 1e3:>10.3f} ms{result['best'] * 1e3:>10.3f} ms"
+              f"{change:>+8.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the parse/plot/layout/encode/clipboard paths per structure")
+    parser.add_argument('--save', metavar='FILE', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='FILE', help="fail if a path regressed against this baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument('-k', action='append', metavar='SUBSTRING',
+                        help="only run paths whose name contains this (may be repeated)")
+    parser.add_argument('--no-qt', action='store_true', help="skip the Qt clipboard path")
+    parser.add_argument('--repeat', type=int, default=5, help="rounds per path (default 5)")
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help="minimum seconds per round (default 0.1)")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # SimHei.ttf and 11.py are looked up relative to the repo
+    apply_style()
+
+    print(f"{'':<36}{'best':>13}{'median':>13}{'calls':>8}")
+    results = run(args)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f,
+                      ensure_ascii=False, indent=1)
+        print(f"\nbaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != environment():
+            print(f"\nwarning: baseline was recorded on {baseline.get('environment')}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} path(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
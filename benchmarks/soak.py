@@ -0,0 +1,191 @@
+"""Soak test: drives an app through many update cycles and tracks memory over time.
+
+Usage:
+    python benchmarks/soak.py [--app qt|streamlit] [--cycles N] [--every N]
+                              [--mode blit|full] [--tracemalloc] [--out FILE.csv]
+                              [--max-growth-mb MB]
+
+qt         OptionApp on the offscreen Qt platform. A cycle switches the structure
+           (change_option_type), pastes a product row (parse_parameters), then
+           calls update_plot and copy_to_clipboard. Default 20000 cycles.
+streamlit  12.py through streamlit.testing.v1.AppTest. A cycle selects the
+           structure, pastes a product row, clicks 一键解析 and reruns the
+           script. Default 2000 cycles, as every run executes the whole script.
+
+Each cycle pastes different numbers, so every label and title changes. Every
+`--every` cycles a sample is printed (and written to --out as CSV):
+
+    rss        resident set size of this process, MB
+    child_rss  resident set size of child processes (render workers), MB
+    blocks     sys.getallocatedblocks(), the live Python allocations
+    traced     tracemalloc's current traced MB (only with --tracemalloc, which is slow)
+    objects    len(gc.get_objects())
+    widgets    QApplication.allWidgets() (qt only)
+    artists    artists in the app's figures (qt only)
+    p50/p99/max  latency of the cycles since the previous sample, ms
+
+Growth is reported from the first sample (taken after a warm-up) to the last;
+with --max-growth-mb the exit status is 1 when RSS grew by more than that.
+"""
+import argparse
+import csv
+import gc
+import importlib.util
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from micro import sheet_text  # noqa: E402
+from option_charts import get_initial_data  # noqa: E402
+
+WARM_UP = 50  # cycles before the first sample
+
+
+def rss_mb(pid='self'):
+    """Resident set size from /proc, in MB (0 where /proc is unavailable)."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def product_texts(data, n):
+    """Yields (option_type, pasted text) round-robin over the structures, varying the numbers."""
+    types = list(data)
+    for i in range(n):
+        option_type = types[i % len(types)]
+        scale = 1 + (i % 97) / 1000
+        params = {key: round(value * scale, 2) if isinstance(value, float) else value
+                  for key, value in data[option_type]['params'].items()}
+        yield option_type, sheet_text(option_type, params)
+
+
+def qt_driver(args):
+    """Returns (cycle function, extra metrics function) for OptionApp."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    spec = importlib.util.spec_from_file_location('app11', os.path.join(ROOT, '11.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    window = module.OptionApp(render_mode=args.mode)
+    window.show()
+    while window.canvas is None:
+        app.processEvents()
+
+    def cycle(option_type, text):
+        window.type_combo.setCurrentText(option_type)  # change_option_type
+        window.parse_text.setPlainText(text)
+        window.parse_parameters()
+        window.update_plot()
+        window.copy_to_clipboard()
+        app.processEvents()
+
+    def metrics():
+        return {'widgets': len(app.allWidgets()), 'artists': len(window.figure.findobj())}
+
+    return cycle, metrics
+
+
+def streamlit_driver(args):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, '12.py'), default_timeout=120).run()
+
+    def cycle(option_type, text):
+        at.selectbox(key='current_option').set_value(option_type)
+        at.text_area(key='parse_text').input(text)
+        at.button[0].click().run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    return cycle, dict
+
+
+def child_rss_mb():
+    return sum(rss_mb(child.pid) for child in multiprocessing.active_children())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many update cycles and track memory and latency")
+    parser.add_argument('--app', choices=['qt', 'streamlit'], default='qt')
+    parser.add_argument('--cycles', type=int, help="cycles to run (default 20000 qt, 2000 streamlit)")
+    parser.add_argument('--every', type=int, default=None, help="cycles between samples")
+    parser.add_argument('--mode', choices=['blit', 'full'], default='blit', help="OptionApp render mode")
+    parser.add_argument('--tracemalloc', action='store_true', help="also track the traced Python heap (slow)")
+    parser.add_argument('--out', metavar='FILE', help="write the samples as CSV")
+    parser.add_argument('--max-growth-mb', type=float, default=None,
+                        help="exit with status 1 if RSS grew by more than this")
+    args = parser.parse_args(argv)
+    cycles = args.cycles or (20000 if args.app == 'qt' else 2000)
+    every = args.every or max(1, cycles // 40)
+
+    os.chdir(ROOT)  # SimHei.ttf and the app scripts are looked up relative to the repo
+    cycle, metrics = (qt_driver if args.app == 'qt' else streamlit_driver)(args)
+    products = product_texts(get_initial_data(), cycles + WARM_UP)
+    for _ in range(WARM_UP):
+        cycle(*next(products))
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    samples = []
+    latencies = []
+    start = time.perf_counter()
+
+    def sample(n):
+        gc.collect()
+        row = {'cycle': n, 'seconds': round(time.perf_counter() - start, 1),
+               'rss': round(rss_mb(), 1), 'child_rss': round(child_rss_mb(), 1),
+               'blocks': sys.getallocatedblocks(),
+               'traced': round(tracemalloc.get_traced_memory()[0] / 2**20, 1) if args.tracemalloc else '',
+               'objects': len(gc.get_objects()), **metrics()}
+        row.update(p50='', p99='', max='')
+        if latencies:
+            ordered = sorted(latencies)
+            row.update(p50=round(statistics.median(ordered) * 1e3, 2),
+                       p99=round(ordered[round(0.99 * (len(ordered) - 1))] * 1e3, 2),
+                       max=round(ordered[-1] * 1e3, 2))
+            latencies.clear()
+        if not samples:
+            print('  '.join(f"{key:>9}" for key in row))
+        samples.append(row)
+        print('  '.join(f"{value:>9}" for value in row.values()), flush=True)
+
+    sample(0)
+    for n, product in enumerate(products, start=1):
+        t0 = time.perf_counter()
+        cycle(*product)
+        latencies.append(time.perf_counter() - t0)
+        if n % every == 0 or n == cycles:
+            sample(n)
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0]))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    first, last = samples[0], samples[-1]
+    print(f"\nafter {cycles} cycles:")
+    for key in ('rss', 'child_rss', 'blocks', 'objects', 'widgets', 'artists'):
+        if key in first:
+            print(f"  {key:<10}{first[key]:>12} -> {last[key]:<12} ({last[key] - first[key]:+.1f})")
+    timed = [row for row in samples if row['p50'] != '']
+    if len(timed) >= 2:
+        print(f"  p50 ms    {timed[0]['p50']:>12} -> {timed[-1]['p50']}")
+    if args.max_growth_mb is not None and last['rss'] - first['rss'] > args.max_growth_mb:
+        print(f"RSS grew by more than {args.max_growth_mb} MB")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Cold-start benchmark for both apps.
+
+Usage:
+    python benchmarks/startup.py [--repeat 3] [--app 11|12]
+
+Every sample runs in a fresh interpreter, so nothing is cached in sys.modules
+and the numbers are what a new Streamlit pod or a freshly launched desktop app
+pays. Times are seconds from the first line of the sample script:
+
+    12.py import        executing the script module (imports only, main() not run)
+    12.py first chart   first AppTest run of 12.py, including render-worker start-up
+    11.py import        executing 11.py as a module
+    11.py window        OptionApp constructed and shown (offscreen Qt platform)
+    11.py first chart   the first chart drawn on the canvas
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP12 = r'''
+import json, time, importlib.util
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location('app12', '12.py')
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+t1 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('12.py', default_timeout=300).run()
+t2 = time.perf_counter()
+if at.exception:
+    raise SystemExit(str(at.exception))
+print(json.dumps({'12.py import': t1 - t0, '12.py first chart': t2 - t0}))
+'''
+
+APP11 = r'''
+import json, sys, time, importlib.util
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location('app11', '11.py')
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+t1 = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+window = module.OptionApp()
+window.show()
+t2 = time.perf_counter()
+while window.canvas is None:
+    app.processEvents()
+t3 = time.perf_counter()
+print(json.dumps({'11.py import': t1 - t0, '11.py window': t2 - t0, '11.py first chart': t3 - t0}))
+'''
+
+SAMPLES = {'12': APP12, '11': APP11}
+
+
+def run_sample(code):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', PYTHONWARNINGS='ignore')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-first-chart of both apps")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per app (default 3)")
+    parser.add_argument('--app', choices=sorted(SAMPLES), action='append',
+                        help="only benchmark this app (may be given twice)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for app in args.app or ['12', '11']:
+        for _ in range(args.repeat):
+            for name, seconds in run_sample(SAMPLES[app]).items():
+                results.setdefault(name, []).append(seconds)
+
+    print(f"{'':<20}{'median':>9}{'min':>9}{'max':>9}")
+    for name, samples in results.items():
+        print(f"{name:<20}{statistics.median(samples):>9.3f}{min(samples):>9.3f}{max(samples):>9.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Content-addressed cache for rendered chart images.
+
+Keys are a hash of (structure type, params, figure size, dpi, format), so two
+requests for the same product share one entry no matter which session or tool
+asked first. Entries live in an in-memory LRU tier bounded by a byte budget,
+optionally backed by a directory on disk that survives restarts. The disk tier
+has its own byte budget: a write that takes it over the budget deletes the
+least recently used files (by mtime, which a disk hit refreshes) until a
+quarter of the budget is free again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def chart_key(option_type, params, figsize, dpi, fmt='png'):
+    """Returns a stable hex digest identifying one rendered chart."""
+    payload = json.dumps([option_type, params, list(figsize), dpi, fmt],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChartCache:
+    """Thread-safe two-tier (memory LRU + optional disk) store of image bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_files(self):
+        """(path, size, mtime) of every entry in the disk tier."""
+        files = []
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except OSError:  # removed meanwhile, e.g. by another process
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _prune_disk(self):
+        """Deletes the least recently used files until the disk tier is at 3/4 of its budget."""
+        files = sorted(self._disk_files(), key=lambda file: file[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.disk_max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def get(self, key):
+        """Returns the cached bytes for `key`, or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            try:
+                path = self._disk_path(key)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)  # keeps it out of the next prune
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.disk_hits += 1
+                return data
+        return None
+
+    def put(self, key, data):
+        """Stores `data` in memory and, if configured, on disk."""
+        self._remember(key, data)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_bytes += len(data)
+                full = self._disk_bytes > self.disk_max_bytes
+            if full:
+                self._prune_disk()
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_render(self, key, render):
+        """Returns the bytes for `key`, calling `render()` at most once per key at a time.
+
+        Concurrent callers asking for the same missing key wait for the first
+        caller's render instead of rendering it again.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+                self.misses += 1
+
+        if not owner:
+            event.wait()
+            data = self.get(key)
+            if data is not None:
+                return data
+            return self.get_or_render(key, render)
+
+        try:
+            data = render()
+            self.put(key, data)
+            return data
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def stats(self):
+        """Returns entry/byte counts and hit counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'disk_bytes': self._disk_bytes,
+                'disk_max_bytes': self.disk_max_bytes,
+            }
@@ -0,0 +1,237 @@
+"""Local HTTP service that renders payoff charts for other tools.
+
+Usage:
+    python chart_server.py [--host 127.0.0.1] [--port 8765] [-w N] [--queue N]
+                           [--cache-mb 128] [--cache-dir DIR] [--disk-cache-mb 512]
+                           [--figure-mb 64]
+
+Endpoints:
+    POST /render    JSON body
+                        {"option_type": "看涨香草", "params": {"strike": 100, ...},
+                         "format": "png", "dpi": 100, "figsize": [8, 6]}
+                    params missing from the body keep their default values.
+                    Or a text body with a header row and a data row, exactly as
+                    pasted into the apps (Content-Type text/tab-separated-values
+                    or text/plain); format/dpi then come from the query string,
+                    e.g. /render?format=svg&dpi=150.
+                    Responds with image/png or image/svg+xml. X-Cache says
+                    whether the image came from the cache.
+    GET /health     JSON with the pool size, cache statistics and the render
+                    workers' figure counts.
+
+Only the standard library is used on top of the repo's own dependencies.
+Connections are kept alive (HTTP/1.1), renders run in a pre-warmed pool of
+worker processes (render_pool), and identical requests are served from a
+content-addressed cache (chart_cache). Errors come back as JSON
+{"error": "..."}: 400 for bad input and 503 when the render queue is full.
+"""
+import argparse
+import json
+import math
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from chart_cache import ChartCache, chart_key
+from ingest import row_params
+from option_charts import get_initial_data
+from render_pool import RenderPool
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+MAX_BODY = 1024 * 1024
+RENDER_TIMEOUT = 30  # seconds to wait for a free render slot
+
+
+def _check_finite(params):
+    for key, value in params.items():
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(f"参数{key}必须是有限的数字: {value!r}")
+    return params
+
+
+def product_from_json(payload, defaults):
+    """Returns (option_type, params) from a JSON request body, filling gaps from the defaults."""
+    if not isinstance(payload, dict):
+        raise ValueError("请求体必须是JSON对象")
+    option_type = payload.get('option_type')
+    if not isinstance(option_type, str) or option_type not in defaults:
+        raise ValueError(f"未知的结构类型: {option_type!r}")
+    overrides = payload.get('params')
+    if overrides is None:
+        overrides = {}
+    elif not isinstance(overrides, dict):
+        raise ValueError("params必须是JSON对象")
+    params = dict(defaults[option_type]['params'])
+    for key, value in overrides.items():
+        if key not in params:
+            continue
+        if isinstance(params[key], float):
+            try:
+                value = float(str(value).replace('%', ''))
+            except ValueError:
+                raise ValueError(f"参数{key}不是数字: {value!r}") from None
+        elif not isinstance(value, str):
+            raise ValueError(f"参数{key}必须是文本: {value!r}")
+        params[key] = value
+    return option_type, _check_finite(params)
+
+
+def product_from_text(text, defaults):
+    """Returns (option_type, params) from a header row and a data row of tab-separated text."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 2 or '\t' not in lines[1]:
+        raise ValueError("需要包含表头和数据的两行制表符分隔文本")
+    option_type, params = row_params(lines[0].split('\t'), lines[1].split('\t'), defaults)
+    return option_type, _check_finite(params)
+
+
+class ChartRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive; every response sets Content-Length
+    # headers and body are separate writes; without TCP_NODELAY each keep-alive
+    # response stalls on a delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    server_version = 'ChartServer/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8')
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            self._send_json(404, {'error': f"未知路径: {self.path}"})
+            return
+        pool = self.server.pool
+        self._send_json(200, {'status': 'ok', 'workers': pool.workers, 'max_pending': pool.max_pending,
+                              'cache': self.server.cache.stats(), 'figures': pool.figure_stats()})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # the body cannot be skipped without a length, so the connection is closed
+            self.close_connection = True
+            self._send_json(400, {'error': "Content-Length无效"})
+            return
+        if length > MAX_BODY:
+            self.close_connection = True
+            self._send_json(413, {'error': "请求体过大"})
+            return
+        body = self.rfile.read(length)
+        if url.path != '/render':
+            self._send_json(404, {'error': f"未知路径: {url.path}"})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            options = dict(query)
+            content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip()
+            text = body.decode('utf-8-sig')
+            if content_type == 'application/json' or text.lstrip().startswith('{'):
+                payload = json.loads(text)
+                option_type, params = product_from_json(payload, self.server.defaults)
+                options.update((k, payload[k]) for k in ('format', 'dpi', 'figsize') if k in payload)
+            else:
+                option_type, params = product_from_text(text, self.server.defaults)
+
+            fmt = str(options.get('format', 'png')).lower()
+            if fmt not in CONTENT_TYPES:
+                raise ValueError(f"不支持的格式: {fmt}")
+            dpi = int(options.get('dpi', 100))
+            figsize = options.get('figsize', (8, 6))
+            if isinstance(figsize, str):
+                figsize = figsize.split(',')
+            figsize = tuple(float(v) for v in figsize)
+            if not (10 <= dpi <= 600 and len(figsize) == 2 and all(0 < v <= 40 for v in figsize)):
+                raise ValueError("dpi或figsize超出范围")
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except (TypeError, AttributeError, OverflowError) as e:
+            # wrong JSON types, e.g. "figsize": 5 or "dpi": null
+            self._send_json(400, {'error': f"请求格式不正确: {e}"})
+            return
+
+        key = chart_key(option_type, params, figsize, dpi, fmt)
+        cache = self.server.cache
+        data = cache.get(key)
+        status = 'hit'
+        if data is None:
+            status = 'miss'
+            try:
+                data = cache.get_or_render(key, lambda: self.server.pool.render(
+                    option_type, params, figsize, fmt=fmt, dpi=dpi, timeout=RENDER_TIMEOUT))
+            except TimeoutError as e:
+                self._send_json(503, {'error': str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+                return
+        self._send(200, data, CONTENT_TYPES[fmt], [('X-Cache', status)])
+
+
+class ChartServer(ThreadingHTTPServer):
+    """HTTP server owning the render pool, the cache and the default params."""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, max_pending=None, cache_bytes=128 * 1024 * 1024,
+                 cache_dir=None, disk_cache_bytes=512 * 1024 * 1024, figure_bytes=64 * 1024 * 1024,
+                 verbose=False):
+        super().__init__(address, ChartRequestHandler)
+        self.verbose = verbose
+        self.defaults = get_initial_data()
+        self.cache = ChartCache(max_bytes=cache_bytes, disk_dir=cache_dir, disk_max_bytes=disk_cache_bytes)
+        self.pool = RenderPool(workers=workers, max_pending=max_pending, figure_bytes=figure_bytes)
+        self.pool.warm_up()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="期权结构图渲染服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--queue', type=int, default=None, help="最多排队的渲染数")
+    parser.add_argument('--cache-mb', type=int, default=128)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--disk-cache-mb', type=int, default=512, help="磁盘缓存的容量上限")
+    parser.add_argument('--figure-mb', type=int, default=64, help="每个渲染进程空闲图形的内存上限")
+    parser.add_argument('-v', '--verbose', action='store_true', help="打印每个请求")
+    args = parser.parse_args(argv)
+
+    server = ChartServer((args.host, args.port), workers=args.workers, max_pending=args.queue,
+                         cache_bytes=args.cache_mb * 1024 * 1024, cache_dir=args.cache_dir,
+                         disk_cache_bytes=args.disk_cache_mb * 1024 * 1024,
+                         figure_bytes=args.figure_mb * 1024 * 1024, verbose=args.verbose)
+    print(f"渲染服务已启动: http://{args.host}:{server.server_address[1]} "
+          f"（{server.pool.workers}个渲染进程）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Reusable Figure/Axes pairs with a memory budget.
+
+Creating a figure per chart is slow, and figures that are never closed keep
+their artists and Agg pixel buffer alive for the life of the process (pyplot's
+figure manager holds on to every plt.subplots() figure). A FigurePool instead
+keeps one idle Figure/Axes pair per (structure type, figure size):
+
+    pool = FigurePool(max_bytes=64 * 1024 * 1024)
+    with pool.figure('看涨香草', (8, 6)) as (fig, ax):
+        render_chart(fig, '看涨香草', params, ax=ax)
+
+A pair is checked out for the duration of the with-block and cleared when it
+is handed back, so an idle figure holds no artists. What it still holds is its
+Agg buffer (width x height x 4 bytes at the last dpi it was drawn at); when the
+idle figures together exceed `max_bytes`, the least recently used ones are
+dropped. stats() reports live figure and byte counts.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from option_charts import new_figure
+
+# Rough per-figure cost of the Figure/Axes objects themselves, on top of the pixel buffer
+FIGURE_OVERHEAD = 256 * 1024
+
+
+def figure_bytes(fig):
+    """Estimated memory held by an idle figure: its Agg buffer plus FIGURE_OVERHEAD."""
+    renderer = getattr(fig.canvas, 'renderer', None)
+    if renderer is None:
+        return FIGURE_OVERHEAD
+    return int(renderer.width) * int(renderer.height) * 4 + FIGURE_OVERHEAD
+
+
+class FigurePool:
+    """Thread-safe LRU of idle Figure/Axes pairs, bounded by a byte budget."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._idle = OrderedDict()  # (option_type, figsize) -> (fig, ax, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, option_type, figsize=(8, 6)):
+        """Checks out an empty (fig, ax) for `option_type`, creating one if none is idle."""
+        key = (option_type, tuple(figsize))
+        with self._lock:
+            entry = self._idle.pop(key, None)
+            self.in_use += 1
+            if entry is not None:
+                self.hits += 1
+                self._bytes -= entry[2]
+                return entry[0], entry[1]
+            self.misses += 1
+        fig = new_figure(key[1])
+        return fig, fig.add_subplot(111)
+
+    def release(self, option_type, figsize, fig, ax):
+        """Clears `ax` and returns the pair to the pool, evicting idle figures over budget."""
+        ax.cla()
+        key = (option_type, tuple(figsize))
+        nbytes = figure_bytes(fig)
+        with self._lock:
+            self.in_use -= 1
+            old = self._idle.pop(key, None)  # a second pair checked out for the same key
+            if old is not None:
+                self._bytes -= old[2]
+                self.evictions += 1
+            self._idle[key] = (fig, ax, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._idle:
+                _, (evicted, _, size) = self._idle.popitem(last=False)
+                evicted.clear()
+                self._bytes -= size
+                self.evictions += 1
+
+    @contextmanager
+    def figure(self, option_type, figsize=(8, 6)):
+        """Context manager around acquire/release yielding (fig, ax)."""
+        fig, ax = self.acquire(option_type, figsize)
+        try:
+            yield fig, ax
+        finally:
+            self.release(option_type, figsize, fig, ax)
+
+    def clear(self):
+        """Drops every idle figure."""
+        with self._lock:
+            for fig, _, _ in self._idle.values():
+                fig.clear()
+            self._idle.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns live figure/byte counts and hit counters."""
+        with self._lock:
+            return {
+                'figures': len(self._idle) + self.in_use,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,200 @@
+"""Batched Greeks for every structure in get_initial_data().
+
+greeks(option_type, params, sigma, ...) takes a dict of flat arrays (one entry
+per product, payoff.stack_params(rows, column=False)) and returns arrays of
+
+    value   present value, % of notional: annualised return × tenor, discounted
+    delta   d value / d(S/S0), i.e. per 100% move of the underlying
+    gamma   d² value / d(S/S0)²
+    vega    d value / d sigma, per 1.00 of volatility
+    theta   change in value per year of calendar time, spot and vol unchanged
+
+Where closed forms exist they are used directly:
+
+    看涨香草   Black–Scholes calls
+    价差       Black–Scholes call or put spreads between strike and knock_out
+    看涨敲出   a European digital at knock_out (observed once, at maturity)
+    单鲨       central differences of the closed-form barrier pricer in
+               sharkfin_analytics, with all bumps of all products in one call
+    三元小雪球  Monte Carlo: every product and every bump is a leg of one
+               simulation on common random numbers (snowball_mc.snowball_leg_values)
+
+The accrual period in `value` is the product's full tenor; theta only shortens
+the time left for the underlying to move and to be discounted over.
+"""
+import numpy as np
+
+from payoff import batch_tenor_years, charted_participation
+from sharkfin_analytics import bs_forward, norm_cdf, norm_pdf, sharkfin_stats
+from snowball_mc import DAYS_PER_MONTH, snowball_leg_values
+
+SPOT_BUMP = 0.01
+VOL_BUMP = 0.01
+DAY = 1.0 / (12 * DAYS_PER_MONTH)
+
+GREEKS = ('value', 'delta', 'gamma', 'vega', 'theta')
+
+
+def _tenors(params, tenor, n):
+    if tenor is None:
+        tenor = batch_tenor_years(np.ravel(params['month']))
+    return np.broadcast_to(np.asarray(tenor, dtype=float), (n,))
+
+
+def _vanilla(call, strike, tenor, sigma, r, q):
+    """Undiscounted Black–Scholes value and its spot, vol and tenor derivatives."""
+    value, d1, d2 = bs_forward(call, strike, tenor, sigma, r, q)
+    forward = np.exp((r - q) * tenor)
+    root = np.sqrt(tenor)
+    pdf = norm_pdf(d1)
+    itm = np.where(call, norm_cdf(d1), -norm_cdf(-d1))
+    return {
+        'value': value,
+        'delta': forward * itm,
+        'gamma': forward * pdf / (sigma * root),
+        'vega': forward * pdf * root,
+        'd_tenor': (r - q) * forward * itm + forward * pdf * sigma / (2 * root),
+    }
+
+
+def _digital(barrier, tenor, sigma, r, q):
+    """Probability of finishing at or above `barrier`, with the same derivatives."""
+    _, d1, d2 = bs_forward(True, barrier, tenor, sigma, r, q)
+    root = np.sqrt(tenor)
+    pdf = norm_pdf(d2)
+    drift = r - q - 0.5 * sigma ** 2
+    return {
+        'value': norm_cdf(d2),
+        'delta': pdf / (sigma * root),
+        'gamma': -pdf * d1 / (sigma ** 2 * tenor),
+        'vega': -pdf * d1 / sigma,
+        'd_tenor': pdf * (drift / (2 * sigma * root) + np.log(barrier) / (2 * sigma * tenor * root)),
+    }
+
+
+def _affine(base, scale, leg, tenor, r):
+    """Greeks of T·e^{-rT}·(base + scale·leg) given the Greeks of `leg`."""
+    accrual = tenor * np.exp(-r * tenor)
+    value = accrual * (base + scale * leg['value'])
+    out = {key: accrual * scale * leg[key] for key in ('delta', 'gamma', 'vega')}
+    out['value'] = value
+    out['theta'] = r * value - accrual * scale * leg['d_tenor']
+    return out
+
+
+def _spread(call, k, h, tenor, sigma, r, q):
+    near = _vanilla(call, k, tenor, sigma, r, q)
+    far = _vanilla(call, h, tenor, sigma, r, q)
+    return {key: near[key] - far[key] for key in near}
+
+
+def _sharkfin_bumped(params, call, tenor, sigma, r, q):
+    """Central differences of sharkfin_stats, every bump of every product in one call.
+
+    Moving spot by a factor u is the same as dividing strike and knock_out by u
+    and multiplying the participation rate by u (returns are quoted on S0).
+    """
+    n = call.size
+    u = np.repeat([1.0, 1 + SPOT_BUMP, 1 - SPOT_BUMP, 1.0, 1.0, 1.0], n)
+    dvol = np.repeat([0.0, 0.0, 0.0, VOL_BUMP, -VOL_BUMP, 0.0], n)
+    dtime = np.repeat([0.0, 0.0, 0.0, 0.0, 0.0, DAY], n)
+    tile = lambda a: np.tile(np.broadcast_to(np.asarray(a), (n,)), 6)
+
+    bumped = {key: tile(params[key]) for key in
+              ('strike', 'knock_out', 'participation_rate', 'min_ret', 'knock_ret', 'type')}
+    bumped['strike'] = bumped['strike'] / u
+    bumped['knock_out'] = bumped['knock_out'] / u
+    bumped['participation_rate'] = tile(charted_participation(params)) * u
+    remaining = tile(tenor) - dtime
+    rate = tile(r)
+    stats = sharkfin_stats(bumped, tile(call), remaining, tile(sigma) + dvol, rate, tile(q))
+    pv = (stats['expected_return'] * tile(tenor) * np.exp(-rate * remaining)).reshape(6, n)
+
+    base, up, down, vol_up, vol_down, later = pv
+    return {
+        'value': base,
+        'delta': (up - down) / (2 * SPOT_BUMP),
+        'gamma': (up - 2 * base + down) / SPOT_BUMP ** 2,
+        'vega': (vol_up - vol_down) / (2 * VOL_BUMP),
+        'theta': (later - base) / DAY,
+    }
+
+
+def _snowball(params, tenor, sigma, r, q, n, **mc):
+    """Monte Carlo Greeks: six legs per product (base, spot ±, vol ±, one day on).
+
+    The payoff jumps at both barriers, so gamma and theta are the noisiest of the
+    five; raise n_paths when they matter. Products shorter than one whole month
+    come back as NaN.
+    """
+    months = np.round(tenor * 12)
+    idx = np.flatnonzero(months >= 1)
+    out = {key: np.full(n, np.nan) for key in GREEKS}
+    m = idx.size
+    if m == 0:
+        return out
+    tile = lambda a: np.tile(np.broadcast_to(np.asarray(a, dtype=float), (n,))[idx], 6)
+    shift = np.log([1.0, 1 + SPOT_BUMP, 1 - SPOT_BUMP, 1.0, 1.0, 1.0])
+    legs = {key: tile(params[key]) for key in ('knock_in', 'knock_out', 'ret1', 'ret2', 'ret3')}
+    legs.update(
+        months=tile(months).astype(int),
+        sigma=tile(sigma) + np.repeat([0.0, 0.0, 0.0, VOL_BUMP, -VOL_BUMP, 0.0], m),
+        r=tile(r),
+        q=tile(q),
+        shift=np.repeat(shift, m),
+        offset=np.repeat([0, 0, 0, 0, 0, 1], m),
+    )
+    base, up, down, vol_up, vol_down, later = snowball_leg_values(legs, **mc).reshape(6, m)
+    out['value'][idx] = base
+    out['delta'][idx] = (up - down) / (2 * SPOT_BUMP)
+    out['gamma'][idx] = (up - 2 * base + down) / SPOT_BUMP ** 2
+    out['vega'][idx] = (vol_up - vol_down) / (2 * VOL_BUMP)
+    out['theta'][idx] = (later - base) / DAY
+    return out
+
+
+def greeks(option_type, params, sigma, r=0.0, q=0.0, tenor=None, **mc):
+    """Value, delta, gamma, vega and theta for a batch of products of one structure.
+
+    params  dict of flat arrays, e.g. payoff.stack_params(rows, column=False)
+    sigma, r, q
+            scalars or per-product arrays
+    tenor   years to maturity; parsed from params['month'] when omitted (the
+            三元小雪球 rounds it to whole months). Rows without a usable
+            tenor come back as NaN.
+    mc      n_paths, seed, ... passed on to snowball_leg_values for 三元小雪球
+
+    Returns a dict of arrays keyed by GREEKS.
+    """
+    n = np.size(params['month'])
+    sigma, r, q = (np.broadcast_to(np.asarray(v, dtype=float), (n,)) for v in (sigma, r, q))
+    tenor = _tenors(params, tenor, n)
+    if option_type == '三元小雪球':
+        return _snowball(params, tenor, sigma, r, q, n, **mc)
+
+    if option_type == '看涨敲出':
+        h = np.asarray(params['knock_out'], dtype=float) / 100.0
+        ret1 = np.asarray(params['ret1'], dtype=float)
+        return _affine(ret1, np.asarray(params['ret3'], dtype=float) - ret1,
+                       _digital(h, tenor, sigma, r, q), tenor, r)
+
+    k = np.asarray(params['strike'], dtype=float) / 100.0
+    min_ret = np.asarray(params['min_ret'], dtype=float)
+    if option_type == '看涨香草':
+        pr = np.asarray(params['participation_rate'], dtype=float)
+        return _affine(min_ret, pr / k, _vanilla(np.ones(n, dtype=bool), k, tenor, sigma, r, q), tenor, r)
+
+    if option_type not in ('看涨单鲨/价差', '看跌单鲨/价差'):
+        raise ValueError(f"未知的结构类型: {option_type}")
+    call = np.full(n, option_type == '看涨单鲨/价差')
+    h = np.asarray(params['knock_out'], dtype=float) / 100.0
+    pr = charted_participation(params)
+    out = _affine(min_ret, pr, _spread(call, k, h, tenor, sigma, r, q), tenor, r)
+    shark = np.asarray(params['type']) == '单鲨'
+    if shark.any():
+        idx = np.flatnonzero(shark)
+        sub = {key: np.asarray(value)[idx] for key, value in params.items()}
+        bumped = _sharkfin_bumped(sub, call[idx], tenor[idx], sigma[idx], r[idx], q[idx])
+        for key in GREEKS:
+            out[key][idx] = bumped[key]
+    return out
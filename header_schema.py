@@ -0,0 +1,97 @@
+"""Declarative header schema for pasted / imported product sheets.
+
+HEADER_SCHEMA lists, in priority order, which header texts feed which param
+field and how the cell is converted. A header row is compiled once into a
+HeaderPlan: every column is matched against the schema a single time, and
+each data row is then converted by walking the precomputed (column, field,
+converter) list, with no string matching per cell. Plans are cached per header
+tuple, so a sheet of any length compiles its header exactly once.
+
+Headers are matched after strip().lower(). A rule matches when the header
+contains any of its `include` substrings and none of its `exclude` substrings;
+the first matching rule wins, and columns that match nothing are ignored.
+Empty cells and '-' are skipped. New issuer column names are supported by
+adding substrings to a rule (or passing an extended schema to compile_headers).
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+HeaderRule = namedtuple('HeaderRule', 'field include exclude convert')
+
+# field name used for the 结构 column, which is returned separately from the params
+STRUCTURE = 'structure'
+
+
+def _text(value):
+    return value
+
+
+def _tenor(value):
+    return value.replace('天', 'D').replace('月', 'M')
+
+
+def _percent(value):
+    return float(value.replace('%', ''))
+
+
+def _fee(value):
+    # e.g. '0.42%/年'
+    return float(value.replace('%', '').split('/')[0])
+
+
+HEADER_SCHEMA = (
+    HeaderRule(STRUCTURE, ('结构',), (), _text),
+    HeaderRule('asset', ('标的',), (), _text),
+    HeaderRule('month', ('期限',), (), _tenor),
+    HeaderRule('strike', ('行权价',), (), _percent),
+    HeaderRule('knock_out', ('障碍价', '敲出价'), (), _percent),
+    HeaderRule('knock_in', ('敲入价',), (), _percent),
+    HeaderRule('min_ret', ('保底年化收益',), ('期权',), _percent),
+    HeaderRule('knock_ret', ('敲出年化收益',), ('期权',), _percent),
+    HeaderRule('ret2', ('未敲入未敲出收益',), (), _percent),
+    HeaderRule('ret1', ('敲入未敲出收益',), (), _percent),
+    HeaderRule('ret3', ('敲出收益',), ('敲入',), _percent),
+    HeaderRule('participation_rate', ('参与率',), (), _percent),
+    HeaderRule('max_ret', ('最高收益',), (), _percent),
+    HeaderRule('cost', ('管理费', '期权费'), (), _fee),
+)
+
+
+def match_header(header, schema=HEADER_SCHEMA):
+    """Returns the rule a header cell maps to, or None."""
+    header = header.strip().lower()
+    for rule in schema:
+        if any(s in header for s in rule.include) and not any(s in header for s in rule.exclude):
+            return rule
+    return None
+
+
+class HeaderPlan:
+    """Column-to-field conversion plan for one header row."""
+
+    def __init__(self, headers, schema=HEADER_SCHEMA):
+        self.headers = tuple(headers)
+        self.columns = []
+        for index, header in enumerate(self.headers):
+            rule = match_header(header, schema)
+            if rule is not None:
+                self.columns.append((index, rule.field, rule.convert))
+        self.fields = {field for _, field, _ in self.columns}
+
+    def convert(self, values):
+        """Converts one data row into (structure string or None, params dict)."""
+        params = {}
+        n = len(values)
+        for index, field, convert in self.columns:
+            if index >= n:
+                break
+            value = values[index].strip()
+            if value and value != '-':
+                params[field] = convert(value)
+        return params.pop(STRUCTURE, None), params
+
+
+@lru_cache(maxsize=256)
+def compile_headers(headers, schema=HEADER_SCHEMA):
+    """Cached HeaderPlan for a header tuple."""
+    return HeaderPlan(headers, schema)
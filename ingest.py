@@ -0,0 +1,138 @@
+"""Streaming readers for product sheets: TSV, CSV and XLSX.
+
+Everything here is a generator. Rows are read, parsed and handed on one at a
+time, so memory does not grow with the size of the file:
+
+    headers, rows = read_table('dump.xlsx')          # rows is an iterator
+    for product in iter_products('dump.csv'):
+        product.option_type, product.params          # ready-to-chart param dict
+
+The first non-blank row is the header row, as when pasting into the apps.
+Formats are picked from the file extension (.tsv/.txt, .csv, .xlsx/.xlsm) or
+given explicitly for file objects. XLSX files are opened with openpyxl in
+read-only mode, which streams the sheet XML instead of loading the workbook.
+openpyxl is only needed for XLSX.
+"""
+import csv
+import io
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+from option_charts import get_initial_data, match_option_type, parse_row
+
+FORMATS = {'.tsv': 'tsv', '.txt': 'tsv', '.csv': 'csv', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+
+Product = namedtuple('Product', 'row_no option_type params error')
+
+
+def sheet_format(name, default='tsv'):
+    """Guesses the format from a file name's extension."""
+    return FORMATS.get(os.path.splitext(str(name))[1].lower(), default)
+
+
+def _iter_delimited(source, delimiter, encoding):
+    if isinstance(source, (str, os.PathLike)):
+        f = open(source, encoding=encoding, newline='')
+    elif isinstance(source, io.TextIOBase):
+        f = source
+    else:
+        f = io.TextIOWrapper(source, encoding=encoding, newline='')
+    try:
+        reader = csv.reader(f, delimiter=delimiter)
+        # line_num is the physical line a row ends on (a quoted cell may span lines)
+        for values in reader:
+            yield reader.line_num, values
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            f.close()
+        elif f is not source:
+            f.detach()  # leave the caller's binary file open
+
+
+def _cell_text(cell):
+    value = cell.value
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        # 期限 cells formatted as dates, e.g. 2025-07
+        return value.strftime('%Y-%m')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if '%' in (cell.number_format or ''):
+            value *= 100
+            return f"{value:.10g}%"
+        return f"{value:.10g}"
+    return str(value)
+
+
+def _iter_xlsx(source, sheet):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:  # optional dependency
+        raise ImportError("读取xlsx文件需要安装openpyxl") from e
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        for row_no, row in enumerate(worksheet.iter_rows(), start=1):
+            yield row_no, [_cell_text(cell) for cell in row]
+    finally:
+        workbook.close()
+
+
+def iter_table(source, fmt=None, encoding='utf-8-sig', sheet=None):
+    """Yields (row_no, values) for every non-blank row, header row included.
+
+    source  a path, or a binary/text file object (give `fmt` unless it has a
+            .name with a known extension)
+    fmt     'tsv', 'csv' or 'xlsx'
+    sheet   worksheet name for XLSX; the first sheet by default
+    """
+    fmt = fmt or sheet_format(getattr(source, 'name', source))
+    if fmt == 'xlsx':
+        rows = _iter_xlsx(source, sheet)
+    elif fmt in ('tsv', 'csv'):
+        rows = _iter_delimited(source, '\t' if fmt == 'tsv' else ',', encoding)
+    else:
+        raise ValueError(f"不支持的文件格式: {fmt}")
+    for row_no, values in rows:
+        if any(str(value).strip() for value in values):
+            yield row_no, values
+
+
+def read_table(source, fmt=None, encoding='utf-8-sig', sheet=None):
+    """Returns (headers, rows) where rows is an iterator of (row_no, values)."""
+    rows = iter_table(source, fmt, encoding, sheet)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError(f"{getattr(source, 'name', source)} 为空")
+    return first[1], rows
+
+
+def row_params(headers, values, defaults=None):
+    """Converts one data row into (option_type, params), filling gaps from the defaults.
+
+    Raises ValueError if the 结构 column is missing or not recognised.
+    """
+    structure_type_str, parsed_params = parse_row(headers, values)
+    option_type = match_option_type(structure_type_str)
+    if option_type is None:
+        raise ValueError(f"无法识别结构类型: {structure_type_str!r}")
+    defaults = defaults or get_initial_data()
+    params = dict(defaults[option_type]['params'])
+    for key, value in parsed_params.items():
+        if key in params:
+            params[key] = value
+    return option_type, params
+
+
+def iter_products(source, fmt=None, encoding='utf-8-sig', sheet=None, defaults=None):
+    """Yields a Product per data row; rows that fail to parse carry the error text instead."""
+    headers, rows = read_table(source, fmt, encoding, sheet)
+    defaults = defaults or get_initial_data()
+    for row_no, values in rows:
+        try:
+            option_type, params = row_params(headers, values, defaults)
+            yield Product(row_no, option_type, params, None)
+        except ValueError as e:
+            yield Product(row_no, None, None, str(e))
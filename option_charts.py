@@ -0,0 +1,507 @@
+"""Plotting, parsing and rendering helpers shared by the apps and batch tools.
+
+Nothing in here touches pyplot or Streamlit, so it is safe to import from
+worker processes and headless scripts.
+"""
+import io
+import os
+import re
+from functools import lru_cache
+
+from header_schema import compile_headers
+from tracing import span
+
+
+# --- STYLE ---
+
+_registered_fonts = {}
+
+def register_font(font_path='SimHei.ttf'):
+    """Adds `font_path` to matplotlib's font manager once per process; returns its family name."""
+    family = _registered_fonts.get(font_path)
+    if family is None:
+        from matplotlib import font_manager as fm
+
+        family = 'SimHei'
+        if os.path.exists(font_path):
+            fm.fontManager.addfont(font_path)
+            family = fm.FontProperties(fname=font_path).get_name()
+        _registered_fonts[font_path] = family
+    return family
+
+def apply_style(font_path='SimHei.ttf'):
+    """Applies the rcParams used by both apps, registering `font_path` if it exists."""
+    import matplotlib
+
+    family = register_font(font_path)
+
+    matplotlib.rcParams['font.sans-serif'] = [family, 'DejaVu Sans']
+    matplotlib.rcParams['font.family'] = ['sans-serif']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    matplotlib.rcParams['axes.edgecolor'] = 'grey'
+    matplotlib.rcParams['axes.linewidth'] = 1.0
+
+
+# --- CHART GEOMETRY ---
+# Each geometry function turns a `params` dictionary into the vertices, labels and
+# ticks of one chart. The plot functions, the blitting renderer and the exporters
+# all draw from these, so the shapes are defined in exactly one place.
+# A structure always yields the same number of lines and labels (an unused label
+# has empty text), which lets renderers reuse their artists between updates.
+
+TITLE_SUFFIX = '业绩报酬计提基准（年化)-费率{cost}%'
+
+def sharkfin_call_geometry(params):
+    strike = params['strike']
+    knock_out = params['knock_out']
+    participation_rate = params['participation_rate']
+    min_ret = params['min_ret']
+    max_ret = params['max_ret']
+    knock_ret = params['knock_ret']
+    month = params['month']
+    asset = params['asset']
+    cost = params['cost']
+    type0 = params['type']
+
+    texts = [(x, y + 0.1, f'{y:.2f}%', 'center', 'bottom')
+             for x, y in zip([strike * 0.9, strike, knock_out], [min_ret, min_ret, max_ret])]
+    texts.append(((strike + knock_out) / 2 - 0.5, max_ret / 2 + 0.2, f'参与率{participation_rate:,.1f}%', 'left', 'center'))
+    texts.append((knock_out * 1.01, knock_ret + 0.3, f'敲出{knock_ret:,.2f}%' if type0 == '单鲨' else '', 'left', 'center'))
+
+    title_text = f'{month}美式看涨单鲨（每日观察）-{asset}' if type0 == '单鲨' else f'{month}欧式看涨价差（期末观察一次）-{asset}'
+    return {
+        'ylim': (-1, max_ret + 2),
+        'lines': [([strike * 0.9, strike, knock_out], [min_ret, min_ret, max_ret], 'o'),
+                  ([knock_out, knock_out * 1.05], [knock_ret, knock_ret], 'o')],
+        'texts': texts,
+        'xlabel': ('标的期末价格/期初价格', 'right', 15),
+        'xticks': ([strike, knock_out], [f'{strike:g}%', f'{knock_out:g}%'], 11),
+        'yticks': ([min_ret, max_ret], [f'{min_ret}%', f'{max_ret}%'], 11),
+        'title': f'{title_text}\n' + TITLE_SUFFIX.format(cost=cost),
+        'vline': 100,
+    }
+
+def sharkfin_put_geometry(params):
+    strike = params['strike']
+    knock_out = params['knock_out']
+    participation_rate = params['participation_rate']
+    min_ret = params['min_ret']
+    max_ret = params['max_ret']
+    knock_ret = params['knock_ret']
+    month = params['month']
+    asset = params['asset']
+    cost = params['cost']
+    type0 = params['type']
+
+    texts = [(x, y + 0.1, f'{y:.2f}%', 'center', 'bottom')
+             for x, y in zip([knock_out, strike, strike * 1.1], [max_ret, min_ret, min_ret])]
+    texts.append(((strike + knock_out) / 2, max_ret * 2 / 3, f'参与率{participation_rate:.1f}%', 'left', 'center'))
+    texts.append((knock_out * 0.95, knock_ret * 1.1, f'敲出{knock_ret:,.2f}%' if type0 == '单鲨' else '', 'left', 'center'))
+
+    opt_title = '美式看跌单鲨（每日观察）' if type0 == '单鲨' else '欧式看跌价差（期末观察一次）'
+    return {
+        'ylim': (-1, max_ret + 2),
+        'lines': [([knock_out * 0.9, knock_out], [knock_ret, knock_ret], 'o'),
+                  ([knock_out, strike], [max_ret, min_ret], 'o'),
+                  ([strike, strike * 1.1], [min_ret, min_ret], 'o')],
+        'texts': texts,
+        'xlabel': ('标的期末价格/期初价格', 'right', 10),
+        'xticks': ([strike, knock_out], [f'{strike:g}%', f'{knock_out:g}%'], 11),
+        'yticks': ([min_ret, max_ret], [f'{min_ret:g}%', f'{max_ret:g}%'], 11),
+        'title': f'{month} {opt_title}-{asset}\n' + TITLE_SUFFIX.format(cost=cost),
+        'vline': 100,
+    }
+
+def snowball_geometry(params):
+    knock_in = params['knock_in']
+    knock_out = params['knock_out']
+    ret1 = params['ret1']
+    ret2 = params['ret2']
+    ret3 = params['ret3']
+    month = params['month']
+    asset = params['asset']
+    cost = params['cost']
+
+    return {
+        'ylim': (-1, ret3 + 2),
+        'lines': [([knock_in * 0.8, knock_in], [ret1, ret1], 'o'),
+                  ([knock_in, knock_out], [ret2, ret2], 'o'),
+                  ([knock_out, knock_out * 1.2], [ret3, ret3], 'o')],
+        'texts': [(knock_in * 0.8, ret1 + 0.5, f'保底收益{ret1:,.2f}%', 'left', 'center'),
+                  (knock_in + 3, ret2 + 0.5, f'未敲入未敲出收益{ret2:,.2f}%', 'left', 'center'),
+                  (knock_out * 1.05, ret3 + 0.5, f'敲出收益{ret3:,.2f}%', 'left', 'center')],
+        'xlabel': ('敲出观察日价格/期初价格', 'left', 15),
+        'xticks': ([knock_in, knock_out], [f'{knock_in}%', f'{knock_out}%'], 11),
+        'yticks': ([ret1, ret2, ret3], [f'{ret1}%', f'{ret2}%', f'{ret3}%'], 11),
+        'title': f'{month}三元小雪球（每月观察敲出）-{asset}\n' + TITLE_SUFFIX.format(cost=cost),
+        'vline': None,
+    }
+
+def snowball2_geometry(params):
+    knock_in = params['knock_in']
+    knock_out = params['knock_out']
+    ret1 = params['ret1']
+    ret3 = params['ret3']
+    month = params['month']
+    asset = params['asset']
+    cost = params['cost']
+
+    return {
+        'ylim': (-1, ret3 + 2),
+        'lines': [([knock_in * 0.9, knock_out], [ret1, ret1], 'o'),
+                  ([knock_out, knock_out * 1.2], [ret3, ret3], 'o')],
+        'texts': [(knock_in * 0.95, ret1 + 0.5, f'未敲出收益{ret1:,.2f}%', 'left', 'center'),
+                  (knock_out * 1.05, ret3 + 0.5, f'敲出收益{ret3:,.2f}%', 'left', 'center')],
+        'xlabel': ('敲出观察日价格/期初价格', 'left', 15),
+        'xticks': ([knock_out], [f'{knock_out}%'], 12),
+        'yticks': ([ret1, ret3], [f'{ret1}%', f'{ret3}%'], 11),
+        'title': f'{month}看涨敲出（期末观察一次）-{asset}\n' + TITLE_SUFFIX.format(cost=cost),
+        'vline': None,
+    }
+
+def call_geometry(params):
+    strike = params['strike']
+    participation_rate = params['participation_rate']
+    min_ret = params['min_ret']
+    month = params['month']
+    asset = params['asset']
+    cost = params['cost']
+
+    rise1 = 1.1
+    ret1 = min_ret + participation_rate * (rise1 - 1)
+    rise2 = 1.15
+    ret2 = min_ret + participation_rate * (rise2 - 1)
+
+    texts = [(x, y + 0.1, f'{y:.2f}%', 'center', 'bottom')
+             for x, y in zip([strike * 0.9, strike], [min_ret, min_ret])]
+    texts.append(((strike + rise2 * 100) / 2, ret2 / 2, f'参与率{participation_rate:.2f}%', 'left', 'center'))
+    return {
+        'ylim': (-1, ret2 + 2),
+        'lines': [([strike * 0.9, strike], [min_ret, min_ret], 'o'),
+                  ([strike, strike * rise1, strike * rise2], [min_ret, ret1, ret2], None)],
+        'texts': texts,
+        'xlabel': ('标的期末价格/期初价格', 'right', 15),
+        'xticks': ([strike], [f'{strike}%'], 11),
+        'yticks': ([min_ret], [f'{min_ret}%'], 11),
+        'title': f'{month}看涨香草-{asset}\n' + TITLE_SUFFIX.format(cost=cost),
+        'vline': 100,
+    }
+
+GEOMETRY_FUNCS = {
+    '看涨单鲨/价差': sharkfin_call_geometry,
+    '看跌单鲨/价差': sharkfin_put_geometry,
+    '三元小雪球': snowball_geometry,
+    '看涨敲出': snowball2_geometry,
+    '看涨香草': call_geometry,
+}
+
+def chart_geometry(option_type, params):
+    """Returns the geometry dict for one product of `option_type`."""
+    return GEOMETRY_FUNCS[option_type](params)
+
+def geometry_xlim(geom):
+    """x-range matplotlib autoscales a geometry to: the line data and vline plus 5% padding."""
+    xs = [x for line_xs, _, _ in geom['lines'] for x in line_xs]
+    if geom['vline'] is not None:
+        xs.append(geom['vline'])
+    low, high = min(xs), max(xs)
+    pad = (high - low) * 0.05 or 1.0
+    return low - pad, high + pad
+
+def draw_geometry(ax, geom, animated=False):
+    """Draws a geometry dict onto `ax`; returns the (lines, texts) it created."""
+    ax.set_ylim(*geom['ylim'])
+
+    lines = [ax.plot(xs, ys, marker=marker, linestyle='-', color='#FF6B6B',
+                     linewidth=2, markersize=5, animated=animated)[0]
+             for xs, ys, marker in geom['lines']]
+    texts = [ax.text(x, y, s, ha=ha, va=va, color='black', fontsize=12, animated=animated)
+             for x, y, s, ha, va in geom['texts']]
+
+    label, ha, labelpad = geom['xlabel']
+    ax.set_xlabel(label, ha=ha, fontsize=10, labelpad=labelpad)
+    set_ticks(ax, geom)
+
+    ax.set_title(geom['title'], fontsize=14, pad=20, color='#2C3E50')
+
+    ax.grid(linestyle=':', alpha=0.5, axis='both')
+    ax.axhline(0, color='black', linewidth=0.8)
+    if geom['vline'] is not None:
+        ax.axvline(geom['vline'], color='black', linewidth=0.8)
+    ax.legend(['收益结构曲线'], loc='upper left', fontsize=10, frameon=False)
+    return lines, texts
+
+def set_ticks(ax, geom):
+    """Applies the tick positions and tick labels of a geometry dict."""
+    positions, labels, fontsize = geom['xticks']
+    ax.set_xticks(positions)
+    ax.set_xticklabels(labels, fontsize=fontsize)
+    positions, labels, fontsize = geom['yticks']
+    ax.set_yticks(positions)
+    ax.set_yticklabels(labels, fontsize=fontsize)
+
+
+# --- PLOTTING FUNCTIONS ---
+# Each function now takes the matplotlib axes object `ax` and `params` dictionary as arguments.
+
+def plot_sharkfin_call(ax, params):
+    draw_geometry(ax, sharkfin_call_geometry(params))
+
+def plot_sharkfin_put(ax, params):
+    draw_geometry(ax, sharkfin_put_geometry(params))
+
+def plot_snowball(ax, params):
+    draw_geometry(ax, snowball_geometry(params))
+
+def plot_snowball2(ax, params):
+    draw_geometry(ax, snowball2_geometry(params))
+
+def plot_call(ax, params):
+    draw_geometry(ax, call_geometry(params))
+
+
+# --- PARSING LOGIC ---
+
+def parse_row(headers, values):
+    """Maps one header row and one data row to (structure string, params dict).
+
+    The header is compiled once per distinct header row (see header_schema), so
+    parsing many rows of one sheet only pays for the per-cell conversions.
+    """
+    return compile_headers(tuple(headers)).convert(values)
+
+@lru_cache(maxsize=1024)
+def match_option_type(structure_type_str):
+    """Returns the option type key for a 结构 cell, or None if it is not recognised."""
+    if not structure_type_str:
+        return None
+    structure_mapping = {
+        '三元': '三元小雪球', '看涨敲出': '看涨敲出', '看涨香草': '看涨香草',
+        '单鲨': '看涨单鲨/价差' if '看涨' in structure_type_str else '看跌单鲨/价差',
+        '价差': '看涨单鲨/价差' if '看涨' in structure_type_str else '看跌单鲨/价差'
+    }
+    for key, type_name in structure_mapping.items():
+        if key in structure_type_str:
+            return type_name
+    return None
+
+
+# --- INITIAL DATA ---
+
+def get_initial_data():
+    """Returns the initial dictionary of option types and their parameters."""
+    return {
+        '看涨单鲨/价差': {
+            'params': {'strike': 102.0, 'knock_out': 108.0, 'participation_rate': 49.2, 'min_ret': 1.8, 'max_ret': 4.38, 'knock_ret': 1.8, 'month': '2025-07', 'asset': '沪深300指数', 'cost': 0.42, 'type': '单鲨'},
+            'plot_func': plot_sharkfin_call
+        },
+        '看跌单鲨/价差': {
+            'params': {'strike': 100.0, 'knock_out': 90.0, 'participation_rate': 42.0, 'min_ret': 1.0, 'max_ret': 5.2, 'knock_ret': 2.25, 'month': '3M', 'asset': '黄金现货9999', 'cost': 0.42, 'type': '单鲨'},
+            'plot_func': plot_sharkfin_put
+        },
+        '三元小雪球': {
+            'params': {'knock_in': 80.0, 'knock_out': 100.0, 'ret1': 0.2, 'ret2': 4.0, 'ret3': 4.2, 'month': '24M', 'asset': '中证1000', 'cost': 0.42},
+            'plot_func': plot_snowball
+        },
+        '看涨敲出': {
+            'params': {'knock_in': 100.0, 'knock_out': 101.0, 'ret1': 0.2, 'ret3': 4.15, 'month': '6M', 'asset': '黄金9999', 'cost': 0.22},
+            'plot_func': plot_snowball2
+        },
+        '看涨香草': {
+            'params': {'strike': 100.0, 'participation_rate': 37.0, 'min_ret': 0.05, 'month': '10M', 'asset': '中证1000', 'cost': 0.42},
+            'plot_func': plot_call
+        }
+    }
+
+PLOT_FUNCS = {name: spec['plot_func'] for name, spec in get_initial_data().items()}
+
+
+# --- RENDERING ---
+
+def new_figure(figsize=(8, 6)):
+    """Creates a pyplot-free Figure attached to an Agg canvas."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+# tight_layout measures every title, label and tick text, which is a large share of a
+# render. The margins it picks only depend on the structure, the figure size and the
+# sizes of those texts, plus how far data labels stick out of the axes. Text sizes are
+# cheap to get (matplotlib caches text metrics), so these, in whole pixels, key the
+# margins, and tight_layout runs only when one of them changes. The rounding can move a
+# margin by a pixel or so against a fresh tight_layout.
+LAYOUT_CACHE_SIZE = 512
+_layouts = {}
+
+def _layout_key(fig, ax, option_type):
+    from matplotlib.transforms import Bbox
+
+    renderer = fig.canvas.get_renderer()
+
+    def sizes(texts):
+        return tuple((round(bbox.width), round(bbox.height))
+                     for bbox in (text.get_window_extent(renderer) for text in texts))
+
+    overhang = (0, 0, 0, 0)
+    boxes = [text.get_window_extent(renderer) for text in ax.texts if text.get_text()]
+    if boxes:
+        labels, frame = Bbox.union(boxes), ax.bbox
+        overhang = tuple(max(0, round(d)) for d in (frame.x0 - labels.x0, labels.x1 - frame.x1,
+                                                    frame.y0 - labels.y0, labels.y1 - frame.y1))
+    return (option_type, tuple(fig.get_size_inches()), fig.dpi, overhang,
+            sizes([ax.title, ax.xaxis.label]), sizes(ax.get_xticklabels()), sizes(ax.get_yticklabels()))
+
+def fit_layout(fig, ax, option_type):
+    """Same margins as fig.tight_layout(), measured only when the size of a title, label or tick text changes."""
+    with span('layout'):
+        key = _layout_key(fig, ax, option_type)
+        margins = _layouts.get(key)
+        if margins is not None:
+            fig.subplots_adjust(**margins)
+            return
+        with span('tight_layout'):
+            fig.tight_layout()
+        pars = fig.subplotpars
+        if len(_layouts) >= LAYOUT_CACHE_SIZE:
+            _layouts.pop(next(iter(_layouts)))
+        _layouts[key] = dict(left=pars.left, right=pars.right, bottom=pars.bottom, top=pars.top)
+
+def draw_chart(fig, option_type, params, ax=None):
+    """Plots one product on `ax`, an empty axes of `fig`; by default clears `fig` for a fresh one."""
+    if ax is None:
+        fig.clear()
+        ax = fig.add_subplot(111)
+    with span('plot'):
+        PLOT_FUNCS[option_type](ax, params)
+    fit_layout(fig, ax, option_type)
+    return ax
+
+def render_chart(fig, option_type, params, fmt='png', dpi=100, ax=None, **savefig_kwargs):
+    """Redraws `fig` for one product and returns the encoded image bytes; see draw_chart for `ax`."""
+    draw_chart(fig, option_type, params, ax)
+    buf = io.BytesIO()
+    with span('savefig'):
+        fig.savefig(buf, format=fmt, dpi=dpi, **savefig_kwargs)
+    return buf.getvalue()
+
+def safe_filename(text):
+    """Replaces characters that are not allowed in file names."""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', str(text)).strip('_')
+
+
+class BlitChart:
+    """Renders into an interactive canvas by moving existing artists and blitting.
+
+    Each structure type gets its own axes, built once on first use and hidden while
+    another type is shown. Only the payoff lines (with their markers) and the value
+    labels next to them move; everything else (frame, grid, ticks, title, legend)
+    stays in a background grabbed on a full draw. The reference lines at 0 and at
+    the vline, and the spines where they end, are drawn over the payoff lines, so
+    they are repainted with them.
+
+    An update that leaves the title, ticks, limits and layout alone restores the
+    background, redraws the lines and labels and blits the union of their old and
+    new extents (the reference lines only move with the ticks, so outside that
+    region the screen is already right). Any other update (e.g. a strike or barrier edit, which moves the
+    ticks) redraws the canvas and grabs a new background. The layout is re-fitted on
+    every update (see fit_layout, which only re-measures when a title, label or tick
+    text changes size).
+
+    `geometry` maps (option_type, params) to a geometry dict, chart_geometry by default.
+    """
+
+    BLIT_PAD = 2  # pixels around each artist's extent, for antialiasing
+
+    def __init__(self, fig, geometry=None):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.geometry = geometry or chart_geometry
+        self.charts = {}
+        self.current = None
+        self._background = None
+        self._static_key = None
+        self._extents = []  # window extents of the animated artists as last drawn
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _build(self, option_type, geom):
+        ax = self.fig.add_subplot(111, label=option_type)
+        lines, texts = draw_geometry(ax, geom, animated=True)
+        refs = ax.lines[len(lines):] + list(ax.spines.values())  # axhline / axvline and the frame
+        for ref in refs:
+            ref.set_animated(True)
+        chart = {'ax': ax, 'lines': lines, 'texts': texts, 'moving': lines + texts,
+                 # drawn in the order a full draw would use
+                 'animated': sorted(lines + refs + texts, key=lambda artist: artist.get_zorder()),
+                 'ticks': (geom['xticks'], geom['yticks'])}
+        self.charts[option_type] = chart
+        return chart
+
+    def _on_draw(self, event):
+        # A full draw skips animated artists, so grab the background and paint them on top
+        if self.current is None or self.canvas.is_saving():
+            return
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        """Draws the animated artists; returns the union of the old and new extents of the moving ones."""
+        from matplotlib.transforms import Bbox
+
+        chart = self.charts[self.current]
+        for artist in chart['animated']:
+            chart['ax'].draw_artist(artist)
+        renderer = self.canvas.get_renderer()
+        extents = [artist.get_window_extent(renderer).padded(self.BLIT_PAD) for artist in chart['moving']
+                   if artist.get_visible() and (not hasattr(artist, 'get_text') or artist.get_text())]
+        region = Bbox.union(extents + self._extents) if extents + self._extents else None
+        self._extents = extents
+        return region
+
+    def update(self, option_type, params):
+        """Shows `option_type` with `params`, redrawing as little as possible."""
+        from matplotlib.transforms import Bbox
+
+        with span('geometry'):
+            geom = self.geometry(option_type, params)
+        if option_type != self.current:
+            for other in self.charts.values():
+                other['ax'].set_visible(False)
+            chart = self.charts.get(option_type) or self._build(option_type, geom)
+            chart['ax'].set_visible(True)
+            self.current = option_type
+        chart = self.charts[option_type]
+        ax = chart['ax']
+
+        for line, (xs, ys, _) in zip(chart['lines'], geom['lines']):
+            line.set_data(xs, ys)
+        for text, (x, y, s, _, _) in zip(chart['texts'], geom['texts']):
+            text.set_position((x, y))
+            text.set_text(s)
+        ax.title.set_text(geom['title'])
+
+        ticks = (geom['xticks'], geom['yticks'])
+        if ticks != chart['ticks']:
+            set_ticks(ax, geom)
+            chart['ticks'] = ticks
+        ax.set_ylim(*geom['ylim'])
+        ax.relim()
+        ax.autoscale_view(scalex=True, scaley=False)
+        fit_layout(self.fig, ax, option_type)
+
+        static_key = (option_type, geom['title'], ticks, ax.get_xlim(), ax.get_ylim(),
+                      tuple(ax.get_position().bounds))
+        if static_key != self._static_key or self._background is None:
+            self._static_key = static_key
+            self._extents = []
+            with span('canvas.draw'):
+                self.canvas.draw()
+            return
+
+        with span('blit'):
+            self.canvas.restore_region(self._background)
+            region = self._draw_animated()
+            if region is not None:
+                self.canvas.blit(Bbox.intersection(region, self.fig.bbox) or self.fig.bbox)
@@ -0,0 +1,234 @@
+"""Overlay chart: the payoff curves of many products on one axes.
+
+Usage:
+    python overlay.py shelf.tsv|shelf.csv|shelf.xlsx -o overlay.png [--structure 三元小雪球]
+                      [--asset 中证1000] [--dpi 100]
+
+Where the single-product charts draw every segment and label with their own
+ax.plot / ax.text calls, the overlay evaluates the payoffs of all products at
+once (payoff.py, one vectorized call per structure) on a shared price grid and
+hands the (products × points) vertex array to a single LineCollection. The
+grid contains every barrier and strike of the shelf, so kinks are exact, and
+each curve is broken (NaN) where its payoff jumps, like the separate segments
+of the single charts.
+
+The x axis is the one of the structures' own charts (chart_geometry), so
+only structures that share it can be overlaid: 三元小雪球 and 看涨敲出 plot
+the price on a knock-out observation day, the others the final price.
+
+Each product gets one label with its tenor, asset and headline number.
+Labels are placed greedily in shelf order: a label takes the first of a few
+spots along its curve that stays inside the axes and overlaps no label placed
+before it, and is dropped if there is none. The number of dropped labels is
+shown under the title.
+"""
+import argparse
+import sys
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.ticker import StrMethodFormatter
+
+from ingest import iter_products
+from option_charts import apply_style, chart_geometry, new_figure
+from payoff import payoff, stack_params
+from tracing import span
+
+GRID_POINTS = 400
+BREAKPOINT_KEYS = ('strike', 'knock_in', 'knock_out')
+JUMP_EPS = 1e-6  # in %, the grid points on either side of a barrier
+JUMP_TOL = 1e-6  # in % of return, on top of the step a kink allows
+LABEL_SPOTS = (0.92, 0.75, 0.55, 0.35, 0.15)  # candidate label positions, as fractions of the grid
+LABEL_FONTSIZE = 9
+LABEL_PAD = 2  # pixels between a curve and its label, and around each label box
+COLORS = ['#FF6B6B', '#4D96FF', '#2C3E50', '#6BCB77', '#F4A261',
+          '#9B5DE5', '#00A6A6', '#E76F51', '#8D99AE', '#C9184A']
+
+LABEL_FORMATS = {
+    '看涨单鲨/价差': '{month} {asset} 参与率{participation_rate:.1f}%',
+    '看跌单鲨/价差': '{month} {asset} 参与率{participation_rate:.1f}%',
+    '三元小雪球': '{month} {asset} 敲出{ret3:.2f}%',
+    '看涨敲出': '{month} {asset} 敲出{ret3:.2f}%',
+    '看涨香草': '{month} {asset} 参与率{participation_rate:.2f}%',
+}
+
+
+def product_label(option_type, params):
+    """Short label for one product in an overlay."""
+    return LABEL_FORMATS[option_type].format(**params)
+
+
+def overlay_xlabel(products):
+    """The x-axis label the products' structures share; ValueError if they differ."""
+    labels = {}
+    for option_type, params in products:
+        if option_type not in labels:
+            labels[option_type] = chart_geometry(option_type, params)['xlabel'][0]
+    if len(set(labels.values())) > 1:
+        raise ValueError("横轴含义不同的结构不能叠加: " + '；'.join(
+            f"{option_type}为{label}" for option_type, label in labels.items()))
+    return next(iter(labels.values()))
+
+
+def overlay_curves(products, points=GRID_POINTS):
+    """Evaluates all products on one grid; returns (x in %, y of shape (products, grid)).
+
+    `products` is a list of (option_type, params). y is NaN at a barrier where
+    that product's payoff jumps.
+    """
+    groups = {}
+    for i, (option_type, _) in enumerate(products):
+        groups.setdefault(option_type, []).append(i)
+    barriers = np.unique([params[key] for _, params in products for key in BREAKPOINT_KEYS if key in params]
+                         + [100.0])
+    low, high = barriers[0] * 0.9, barriers[-1] * 1.1
+    x = np.unique(np.concatenate([np.linspace(low, high, points),
+                                  barriers, barriers - JUMP_EPS, barriers + JUMP_EPS]))
+
+    y = np.empty((len(products), len(x)))
+    for option_type, rows in groups.items():
+        params = stack_params([products[i][1] for i in rows])
+        y[rows] = payoff(option_type, params, x / 100.0)
+
+    # across a kink the two points around a barrier differ by at most (|left slope| + |right slope|) × JUMP_EPS;
+    # a jump is a step well beyond that, with the slopes taken from the next grid points out
+    at = np.searchsorted(x, barriers)
+    left = (y[:, at - 1] - y[:, at - 2]) / (x[at - 1] - x[at - 2])
+    right = (y[:, at + 2] - y[:, at + 1]) / (x[at + 2] - x[at + 1])
+    allowed = 2 * (np.abs(left) + np.abs(right)) * JUMP_EPS + JUMP_TOL
+    jumps = np.abs(y[:, at + 1] - y[:, at - 1]) > allowed
+    y[:, at] = np.where(jumps, np.nan, y[:, at])
+    return x, y
+
+
+_advances = {}
+
+
+def text_size(renderer, text, prop):
+    """(width, height) of one line of `text` in pixels, from cached per-character advances.
+
+    Laying out each label with the font engine costs milliseconds; the sum of
+    its characters' advances ignores kerning, which is close enough to place
+    labels.
+    """
+    key = (prop.get_size_in_points(), renderer.dpi)
+    advances = _advances.setdefault(key, {})
+    for char in set(text).difference(advances):
+        advances[char] = renderer.get_text_width_height_descent(char, prop, ismath=False)[0]
+    if '\n' not in advances:  # line height, measured once per size
+        advances['\n'] = renderer.get_text_width_height_descent('国Mg%', prop, ismath=False)[1]
+    return sum(advances[char] for char in text), advances['\n']
+
+
+def place_labels(ax, x, y, labels, renderer, fontsize=LABEL_FONTSIZE):
+    """Greedy collision culling; returns the (index, x, y) of the labels that fit, in data coordinates."""
+    spots = np.searchsorted(x, x[0] + (x[-1] - x[0]) * np.array(LABEL_SPOTS))
+    anchors = np.stack([np.broadcast_to(x[spots], (len(y), len(spots))), y[:, spots]], axis=-1)
+    pixels = ax.transData.transform(anchors.reshape(-1, 2)).reshape(anchors.shape)
+    bounds = ax.bbox
+
+    prop = FontProperties(size=fontsize)
+    placed = np.empty((len(labels), 4))  # x0, y0, x1, y1 of the placed label boxes
+    count = 0
+    result = []
+    for i, label in enumerate(labels):
+        width, height = text_size(renderer, label, prop)
+        for (px, py), (dx, dy) in zip(pixels[i], anchors[i]):
+            if np.isnan(py):
+                continue
+            box = (px - width / 2 - LABEL_PAD, py, px + width / 2 + LABEL_PAD, py + height + 2 * LABEL_PAD)
+            if box[0] < bounds.x0 or box[2] > bounds.x1 or box[3] > bounds.y1:
+                continue
+            others = placed[:count]
+            if np.any((box[0] < others[:, 2]) & (box[2] > others[:, 0])
+                      & (box[1] < others[:, 3]) & (box[3] > others[:, 1])):
+                continue
+            placed[count] = box
+            count += 1
+            result.append((i, dx, dy))
+            break
+    return result
+
+
+def draw_overlay(fig, products, ax=None):
+    """Plots the payoff curves of `products` ((option_type, params) pairs) on one axes of `fig`."""
+    products = list(products)
+    if not products:
+        raise ValueError("没有可叠加的产品")
+    xlabel = overlay_xlabel(products)
+    if ax is None:
+        fig.clear()
+        ax = fig.add_subplot(111)
+
+    with span('overlay.curves'):
+        x, y = overlay_curves(products)
+    colors = [COLORS[i % len(COLORS)] for i in range(len(products))]
+    linewidth = 2 if len(products) <= 10 else 1.2
+    with span('plot'):
+        vertices = np.stack([np.broadcast_to(x, y.shape), y], axis=-1)
+        ax.add_collection(LineCollection(vertices, colors=colors, linewidths=linewidth, alpha=0.85))
+        ax.set_xlim(x[0], x[-1])
+        ax.set_ylim(min(-1, np.nanmin(y) - 0.5), np.nanmax(y) + 2)
+        ax.xaxis.set_major_formatter(StrMethodFormatter('{x:g}%'))
+        ax.yaxis.set_major_formatter(StrMethodFormatter('{x:g}%'))
+        ax.tick_params(labelsize=11)
+        ax.set_xlabel(xlabel, fontsize=10, labelpad=10)
+        ax.grid(linestyle=':', alpha=0.5, axis='both')
+        ax.axhline(0, color='black', linewidth=0.8)
+        ax.axvline(100, color='black', linewidth=0.8)
+
+        types = list(dict.fromkeys(option_type for option_type, _ in products))
+        assets = list(dict.fromkeys(params['asset'] for _, params in products))
+        title = '、'.join(types) + '收益结构对比'
+        if len(assets) == 1:
+            title = f'{assets[0]} {title}'
+        # the second title line is only known after labelling; lay out with one of the same height
+        title_artist = ax.set_title(f'{title}\n共{len(products)}个产品', fontsize=14, pad=20, color='#2C3E50')
+        fig.tight_layout()
+
+    with span('overlay.labels'):
+        labels = [product_label(option_type, params) for option_type, params in products]
+        placed = place_labels(ax, x, y, labels, fig.canvas.get_renderer())
+        for i, dx, dy in placed:
+            ax.annotate(labels[i], (dx, dy), xytext=(0, LABEL_PAD), textcoords='offset pixels',
+                        ha='center', va='bottom', fontsize=LABEL_FONTSIZE, color=colors[i],
+                        bbox=dict(boxstyle='square,pad=0.1', facecolor='white', edgecolor='none', alpha=0.8))
+    title_artist.set_text(f'{title}\n共{len(products)}个产品，{len(products) - len(placed)}个标签因重叠省略')
+    return ax
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="将多个产品的收益结构叠加在一张图上")
+    parser.add_argument('input', help="包含表头行的TSV/CSV/XLSX文件")
+    parser.add_argument('-o', '--out', default='overlay.png', help="输出文件，格式由扩展名决定")
+    parser.add_argument('--structure', help="只叠加该结构的产品，例如 三元小雪球")
+    parser.add_argument('--asset', help="只叠加标的名称包含该文字的产品")
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    apply_style()
+    products = []
+    for product in iter_products(args.input):
+        if product.error:
+            print(f"第{product.row_no}行: {product.error}")
+        elif ((args.structure is None or product.option_type == args.structure)
+              and (args.asset is None or args.asset in str(product.params['asset']))):
+            products.append((product.option_type, product.params))
+    if not products:
+        print("没有符合条件的产品")
+        return 1
+
+    fig = new_figure((10, 7))
+    try:
+        draw_overlay(fig, products)
+    except ValueError as e:
+        print(f"{e}（可用 --structure 只叠加一种结构）")
+        return 1
+    fig.savefig(args.out, dpi=args.dpi)
+    print(f"已叠加 {len(products)} 个产品 -> {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Participation-rate solver: the rate an option budget buys, for a whole shelf at once.
+
+The budget is the premium available for the option leg, in % of notional,
+i.e. what is left once the guaranteed min_ret is funded. For every structure
+with a participation rate the present value of the return above min_ret is
+
+    PV(pr) = DF · T · (E[ret] − min_ret) = fixed + pr · leg
+
+where `leg` is the value of one point of participation and `fixed` the value
+of anything that does not scale with it (the 单鲨 knock-out rebate). Each
+batch therefore prices `fixed` and `leg` once, vectorized over all products,
+and solves PV(pr) = budget for every row in the same step:
+
+    看涨香草   leg from Black–Scholes calls (uncapped)
+    价差       leg from Black–Scholes call or put spreads between strike and knock_out
+    单鲨       leg and rebate from the closed-form barrier pricer in sharkfin_analytics
+"""
+from copy import deepcopy
+
+import numpy as np
+
+from payoff import batch_tenor_years, stack_params
+from sharkfin_analytics import bs_forward, sharkfin_stats
+
+
+def _tenors(params, tenor):
+    if tenor is not None:
+        return np.asarray(tenor, dtype=float)
+    return batch_tenor_years(np.ravel(params['month']))
+
+
+def option_leg(option_type, params, sigma, r=0.0, q=0.0, tenor=None):
+    """Returns (fixed, leg): PV of the rebate and PV per point of participation, % of notional."""
+    tenor = _tenors(params, tenor)
+    discount = tenor * np.exp(-r * tenor)
+    k = np.asarray(params['strike'], dtype=float) / 100.0
+
+    if option_type == '看涨香草':
+        call, _, _ = bs_forward(True, k, tenor, sigma, r, q)
+        return np.zeros_like(k), discount * call / k
+
+    if option_type not in ('看涨单鲨/价差', '看跌单鲨/价差'):
+        raise ValueError(f"{option_type} 没有参与率")
+
+    is_call = option_type == '看涨单鲨/价差'
+    h = np.asarray(params['knock_out'], dtype=float) / 100.0
+    shark = np.asarray(params['type']) == '单鲨'
+
+    near, _, _ = bs_forward(is_call, k, tenor, sigma, r, q)
+    far, _, _ = bs_forward(is_call, h, tenor, sigma, r, q)
+    spread_leg = discount * (near - far)
+
+    fixed = np.zeros_like(k)
+    leg = spread_leg
+    if shark.any():
+        calls = np.full(k.shape, is_call)
+        # without max_ret, sharkfin_stats takes the slope from participation_rate
+        plain = {key: value for key, value in params.items() if key != 'max_ret'}
+        zero = sharkfin_stats(dict(plain, participation_rate=np.zeros_like(k)), calls, tenor, sigma, r, q)
+        one = sharkfin_stats(dict(plain, participation_rate=np.ones_like(k)), calls, tenor, sigma, r, q)
+        min_ret = np.asarray(params['min_ret'], dtype=float)
+        fixed = np.where(shark, zero['present_value'] - discount * min_ret, 0.0)
+        leg = np.where(shark, one['present_value'] - zero['present_value'], spread_leg)
+    return fixed, leg
+
+
+def solve_participation(option_type, params, budget, sigma, r=0.0, q=0.0, tenor=None):
+    """Participation rate (%) that `budget` (% of notional) buys, per product.
+
+    params is a dict of flat arrays (payoff.stack_params(rows, column=False));
+    budget, sigma, r, q and tenor may be scalars or per-product arrays. Rows
+    whose budget does not even cover the rebate come back as NaN.
+    """
+    fixed, leg = option_leg(option_type, params, sigma, r, q, tenor)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (np.asarray(budget, dtype=float) - fixed) / leg
+    return np.where((rate >= 0) & (leg > 0), rate, np.nan)
+
+
+def requote_rows(option_type, rows, budget, sigma, r=0.0, q=0.0, tenor=None):
+    """Returns copies of param dicts with participation_rate (and max_ret) re-solved.
+
+    max_ret is the return at the knock-out level that the sharkfin charts label,
+    so it is kept consistent with the new rate. Rows that cannot be quoted keep
+    their old values and are listed in the second return value by index.
+    """
+    params = stack_params(rows, column=False)
+    rates = solve_participation(option_type, params, budget, sigma, r, q, tenor)
+    quoted, failed = [], []
+    for i, (row, rate) in enumerate(zip(rows, rates)):
+        row = deepcopy(row)
+        if np.isnan(rate):
+            failed.append(i)
+        else:
+            row['participation_rate'] = round(float(rate), 2)
+            if 'max_ret' in row:
+                row['max_ret'] = round(float(row['min_ret'] + rate * abs(row['knock_out'] - row['strike']) / 100.0), 2)
+        quoted.append(row)
+    return quoted, failed
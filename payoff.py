@@ -0,0 +1,154 @@
+"""Vectorized payoff engine for the structures in get_initial_data().
+
+Every payoff maps final-price ratios (S_T / S_0, so 1.0 is the initial level) to
+the annualised return in percent, i.e. the y-axis of the charts. Params use the
+same percent-valued fields as the param dicts; any of them may be NumPy arrays
+and broadcast against `ratio`, so a single call can evaluate one product on
+10^6 price points or many products on a shared grid (see stack_params).
+
+The knock-out/knock-in events of the path-dependent structures cannot be told
+from the final price alone. By default they are inferred from it (a final price
+beyond the barrier means the barrier was touched); pass `knocked_out` /
+`knocked_in` boolean arrays from a path simulation to override that.
+"""
+import re
+
+import numpy as np
+
+
+def _percent(ratio):
+    return np.asarray(ratio, dtype=float) * 100.0
+
+
+def _events(flag, inferred):
+    return inferred if flag is None else np.asarray(flag, dtype=bool) | inferred
+
+
+def charted_participation(params):
+    """Participation rate (%) of a 单鲨/价差, as its chart draws it.
+
+    The chart runs from min_ret at strike to max_ret at knock_out, so params
+    that carry max_ret take the slope from it; participation_rate is used
+    otherwise (e.g. the 0/1 rates of the pricers' linear decompositions).
+    """
+    if 'max_ret' not in params:
+        return np.asarray(params['participation_rate'], dtype=float)
+    width = np.abs(np.asarray(params['knock_out'], dtype=float) - params['strike'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = 100.0 * (np.asarray(params['max_ret'], dtype=float) - params['min_ret']) / width
+    return np.where(width > 0, rate, 0.0)
+
+
+def sharkfin_call_payoff(params, ratio, knocked_out=None):
+    """看涨单鲨/价差: participation above strike, from min_ret up to max_ret at knock_out.
+
+    For 单鲨 a knocked-out product pays knock_ret; for 价差 the barrier is only
+    the cap of the spread, i.e. max_ret.
+    """
+    x = _percent(ratio)
+    strike = params['strike']
+    knock_out = params['knock_out']
+    ret = params['min_ret'] + charted_participation(params) / 100.0 * (np.clip(x, strike, knock_out) - strike)
+    shark = np.asarray(params.get('type', '单鲨')) == '单鲨'
+    hit = _events(knocked_out, x >= knock_out)
+    return np.where(shark & hit, params['knock_ret'], ret)
+
+
+def sharkfin_put_payoff(params, ratio, knocked_out=None):
+    """看跌单鲨/价差: participation below strike, from min_ret up to max_ret at knock_out."""
+    x = _percent(ratio)
+    strike = params['strike']
+    knock_out = params['knock_out']
+    ret = params['min_ret'] + charted_participation(params) / 100.0 * (strike - np.clip(x, knock_out, strike))
+    shark = np.asarray(params.get('type', '单鲨')) == '单鲨'
+    hit = _events(knocked_out, x <= knock_out)
+    return np.where(shark & hit, params['knock_ret'], ret)
+
+
+def snowball_payoff(params, ratio, knocked_in=None, knocked_out=None):
+    """三元小雪球: ret3 if knocked out, else ret1 if knocked in, else ret2."""
+    x = _percent(ratio)
+    out = _events(knocked_out, x >= params['knock_out'])
+    into = _events(knocked_in, x < params['knock_in'])
+    return np.where(out, params['ret3'], np.where(into, params['ret1'], params['ret2']))
+
+
+def snowball2_payoff(params, ratio, knocked_out=None):
+    """看涨敲出 (observed once at maturity): ret3 at or above knock_out, else ret1."""
+    x = _percent(ratio)
+    out = _events(knocked_out, x >= params['knock_out'])
+    return np.where(out, params['ret3'], params['ret1'])
+
+
+def call_payoff(params, ratio):
+    """看涨香草: min_ret plus participation in the rise above strike (relative to strike), uncapped."""
+    x = _percent(ratio)
+    return params['min_ret'] + params['participation_rate'] * np.maximum(x / params['strike'] - 1.0, 0.0)
+
+
+PAYOFF_FUNCS = {
+    '看涨单鲨/价差': sharkfin_call_payoff,
+    '看跌单鲨/价差': sharkfin_put_payoff,
+    '三元小雪球': snowball_payoff,
+    '看涨敲出': snowball2_payoff,
+    '看涨香草': call_payoff,
+}
+
+
+def payoff(option_type, params, ratio, **events):
+    """Evaluates the annualised return (%) of `option_type` on an array of final-price ratios.
+
+    `events` are the optional knocked_in / knocked_out arrays accepted by the
+    structure's payoff function.
+    """
+    return PAYOFF_FUNCS[option_type](params, ratio, **events)
+
+
+def stack_params(rows, column=True):
+    """Turns a list of param dicts of one structure into a dict of arrays.
+
+    With column=True the arrays have shape (n, 1) and broadcast against a 1-D
+    ratio grid of length m, so payoff(option_type, stack_params(rows), grid)
+    returns an (n, m) array. column=False gives flat (n,) arrays, one entry
+    per product, as used by the book-wide pricers.
+    """
+    keys = rows[0].keys()
+    arrays = {key: np.array([row[key] for row in rows]) for key in keys}
+    if column:
+        arrays = {key: value[:, None] for key, value in arrays.items()}
+    return arrays
+
+
+def tenor_months(month):
+    """Parses a 期限 field ('24M', '90D', '1Y') into months.
+
+    A date-like label such as '2025-07' names the product, not its maturity, so
+    it has no tenor: pass one explicitly to the pricers for such rows.
+    """
+    text = str(month).strip().upper()
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([DMY])', text)
+    if m:
+        value, unit = float(m.group(1)), m.group(2)
+        return {'D': value * 12 / 365, 'M': value, 'Y': value * 12}[unit]
+    raise ValueError(f"无法解析期限: {month!r}，请填写如 6M 的期限或直接指定 tenor")
+
+
+def tenor_years(month):
+    """Same as tenor_months, in years."""
+    return tenor_months(month) / 12.0
+
+
+def batch_tenor_years(months):
+    """tenor_years of every entry of an array of 期限 fields; NaN where one cannot be parsed.
+
+    The book pricers use this when no tenor is given, so a row without a usable
+    期限 prices as NaN instead of stopping the whole batch.
+    """
+    months = np.asarray(months)
+    out = np.full(months.shape, np.nan)
+    for i, month in np.ndenumerate(months):
+        try:
+            out[i] = tenor_years(month)
+        except ValueError:
+            pass
+    return out
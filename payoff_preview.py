@@ -0,0 +1,163 @@
+"""Payoff chart painted directly with QPainter, for previews while typing.
+
+A payoff chart is a few polylines, labels and ticks, all of which come from
+option_charts.chart_geometry, the same vertex logic the matplotlib plot
+functions draw. PayoffPreview paints that geometry itself: no figure, no
+layout pass, no Agg rasterisation. A repaint costs well under a millisecond,
+so the preview can follow every keystroke. The look follows the matplotlib
+chart (colours, font sizes, markers, dotted grid, legend), while margins are
+fixed instead of measured. Clipboard and export images are still rendered by
+matplotlib.
+"""
+import os
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QFont, QFontDatabase, QFontMetricsF, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QWidget
+
+from option_charts import chart_geometry, geometry_xlim
+from tracing import span
+
+LINE_COLOR = QColor('#FF6B6B')
+TITLE_COLOR = QColor('#2C3E50')
+GRID_COLOR = QColor(176, 176, 176, 128)  # matplotlib's grid colour at alpha 0.5
+FRAME_COLOR = QColor('grey')
+
+DPI = 100  # sizes are in points at the figure dpi of the matplotlib chart
+PT = DPI / 72  # pixels per point
+MARKER_RADIUS = 2.5 * PT  # markersize 5
+MARGINS = (75, 80, 25, 60)  # left, top, right, bottom in pixels
+
+_font_families = {}
+
+
+def load_font(font_path='SimHei.ttf'):
+    """Registers `font_path` with Qt once; returns its family name, or None to use Qt's default."""
+    if font_path not in _font_families:
+        family = None
+        if os.path.exists(font_path):
+            font_id = QFontDatabase.addApplicationFont(font_path)
+            families = QFontDatabase.applicationFontFamilies(font_id) if font_id >= 0 else []
+            family = families[0] if families else None
+        _font_families[font_path] = family
+    return _font_families[font_path]
+
+
+class PayoffPreview(QWidget):
+    """Widget that paints one product's payoff geometry."""
+
+    def __init__(self, parent=None, font_path='SimHei.ttf', geometry=None):
+        super().__init__(parent)
+        self.geometry = geometry or chart_geometry  # (option_type, params) -> geometry dict
+        self.family = load_font(font_path)
+        self.geom = None
+        self.xlim = None
+        self._fonts = {}
+
+    def set_product(self, option_type, params):
+        """Shows `params` of `option_type`; repaints on the next event loop pass."""
+        self.geom = self.geometry(option_type, params)
+        self.xlim = geometry_xlim(self.geom)
+        self.update()
+
+    def _font(self, points):
+        """(QFont, QFontMetricsF) for a point size, created once per size."""
+        entry = self._fonts.get(points)
+        if entry is None:
+            font = QFont(self.family) if self.family else QFont()
+            font.setPixelSize(round(points * PT))
+            entry = self._fonts[points] = (font, QFontMetricsF(font))
+        return entry
+
+    def _text(self, painter, x, y, text, points, ha='left', va='baseline', color=Qt.black):
+        """Draws `text` at pixel (x, y) aligned like matplotlib's ha/va."""
+        font, metrics = self._font(points)
+        lines = text.split('\n')
+        width = max(metrics.horizontalAdvance(line) for line in lines)
+        height = metrics.lineSpacing() * len(lines)
+        left = {'left': x, 'center': x - width / 2, 'right': x - width}[ha]
+        top = {'top': y, 'center': y - height / 2, 'bottom': y - height,
+               'baseline': y - metrics.ascent()}[va]
+        painter.setFont(font)
+        painter.setPen(QColor(color))
+        align = {'left': Qt.AlignLeft, 'center': Qt.AlignHCenter, 'right': Qt.AlignRight}[ha]
+        painter.drawText(QRectF(left, top, width + 1, height), align | Qt.AlignTop, text)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        try:
+            painter.fillRect(self.rect(), Qt.white)
+            if self.geom is not None:
+                with span('native_preview'):
+                    self._paint(painter)
+        finally:
+            painter.end()
+
+    def _paint(self, painter):
+        geom = self.geom
+        painter.setRenderHint(QPainter.Antialiasing)
+        left, top, right, bottom = MARGINS
+        plot = QRectF(left, top, self.width() - left - right, self.height() - top - bottom)
+        (x0, x1), (y0, y1) = self.xlim, geom['ylim']
+
+        def px(x):
+            return plot.left() + (x - x0) / (x1 - x0) * plot.width()
+
+        def py(y):
+            return plot.bottom() - (y - y0) / (y1 - y0) * plot.height()
+
+        # grid at the ticks, then the axis frame
+        xticks, xlabels, xsize = geom['xticks']
+        yticks, ylabels, ysize = geom['yticks']
+        painter.setPen(QPen(GRID_COLOR, 0.8 * PT, Qt.DotLine))
+        for x in xticks:
+            painter.drawLine(QPointF(px(x), plot.top()), QPointF(px(x), plot.bottom()))
+        for y in yticks:
+            painter.drawLine(QPointF(plot.left(), py(y)), QPointF(plot.right(), py(y)))
+        painter.setPen(QPen(FRAME_COLOR, 1.0))
+        painter.drawRect(plot)
+
+        # ticks and tick labels
+        for x, label in zip(xticks, xlabels):
+            painter.setPen(QPen(Qt.black, 0.8 * PT))
+            painter.drawLine(QPointF(px(x), plot.bottom()), QPointF(px(x), plot.bottom() + 4))
+            self._text(painter, px(x), plot.bottom() + 6, label, xsize, 'center', 'top')
+        for y, label in zip(yticks, ylabels):
+            painter.setPen(QPen(Qt.black, 0.8 * PT))
+            painter.drawLine(QPointF(plot.left() - 4, py(y)), QPointF(plot.left(), py(y)))
+            self._text(painter, plot.left() - 6, py(y), label, ysize, 'right', 'center')
+
+        # reference lines and payoff segments, clipped to the axes like matplotlib lines
+        painter.save()
+        painter.setClipRect(plot)
+        painter.setPen(QPen(Qt.black, 0.8 * PT))
+        painter.drawLine(QPointF(plot.left(), py(0)), QPointF(plot.right(), py(0)))
+        if geom['vline'] is not None:
+            painter.drawLine(QPointF(px(geom['vline']), plot.top()), QPointF(px(geom['vline']), plot.bottom()))
+        painter.setPen(QPen(LINE_COLOR, 2 * PT, Qt.SolidLine, Qt.SquareCap, Qt.RoundJoin))
+        painter.setBrush(LINE_COLOR)
+        for xs, ys, marker in geom['lines']:
+            points = [QPointF(px(x), py(y)) for x, y in zip(xs, ys)]
+            painter.drawPolyline(QPolygonF(points))
+            if marker:
+                for point in points:
+                    painter.drawEllipse(point, MARKER_RADIUS, MARKER_RADIUS)
+        painter.restore()
+
+        # labels are not clipped, as in matplotlib
+        for x, y, text, ha, va in geom['texts']:
+            if text:
+                self._text(painter, px(x), py(y), text, 12, ha, va)
+
+        label, ha, labelpad = geom['xlabel']
+        self._text(painter, plot.center().x(), plot.bottom() + 6 + labelpad + 12, label, 10, ha, 'top')
+        self._text(painter, plot.center().x(), plot.top() - 20 * PT, geom['title'], 14,
+                   'center', 'bottom', TITLE_COLOR)
+
+        # legend, upper left
+        legend_y = plot.top() + 14
+        painter.setPen(QPen(LINE_COLOR, 2 * PT))
+        painter.setBrush(LINE_COLOR)
+        painter.drawLine(QPointF(plot.left() + 8, legend_y), QPointF(plot.left() + 36, legend_y))
+        painter.drawEllipse(QPointF(plot.left() + 22, legend_y), MARKER_RADIUS, MARKER_RADIUS)
+        self._text(painter, plot.left() + 44, legend_y, '收益结构曲线', 10, 'left', 'center')
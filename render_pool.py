@@ -0,0 +1,151 @@
+"""Bounded process pool that renders charts off the calling thread.
+
+Matplotlib is not thread-safe, so concurrent callers (Streamlit runs every
+session in its own script thread) should not draw in-process. RenderPool
+hands each render to a worker process instead. Every worker applies the chart
+style once and reuses figures from a FigurePool, one per structure type and
+figure size, whose idle figures are capped at `figure_bytes`. Each render
+reports the worker's pool counts back, and figure_stats() sums the latest
+report of every worker.
+
+At most `max_pending` renders may be queued or running at once. Further
+callers block for a free slot, up to `timeout` seconds, and then get a
+TimeoutError. A burst therefore queues at a bounded depth instead of piling
+unbounded work onto the pool.
+
+A worker that dies (crash, OOM kill) breaks the whole executor. The pool then
+starts a fresh one and retries the render once; if that fails too, the caller
+gets the BrokenProcessPool error.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from figure_pool import FigurePool
+from option_charts import apply_style, render_chart
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(font_path, figure_bytes):
+    import matplotlib
+    matplotlib.use('Agg')
+    apply_style(font_path)
+    _worker['figures'] = FigurePool(figure_bytes)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _render(option_type, params, figsize, fmt, dpi, savefig_kwargs):
+    figures = _worker['figures']
+    with figures.figure(option_type, figsize) as (fig, ax):
+        data = render_chart(fig, option_type, params, fmt=fmt, dpi=dpi, ax=ax, **savefig_kwargs)
+    return os.getpid(), figures.stats(), data
+
+
+class RenderPool:
+    """Renders charts in worker processes with a bounded number of pending jobs."""
+
+    def __init__(self, workers=None, max_pending=None, font_path='SimHei.ttf',
+                 figure_bytes=64 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.figure_bytes = figure_bytes
+        self.font_path = font_path
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._figure_stats = {}  # worker pid -> FigurePool.stats() after its latest render
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        # spawn, not fork: the parent is typically a multi-threaded server
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.font_path, self.figure_bytes))
+
+    def _restart(self, broken):
+        """Replaces `broken` with a fresh executor, unless another caller already did."""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False)
+                self._figure_stats.clear()
+                self._executor = self._start()
+
+    def warm_up(self):
+        """Starts every worker in the background so the first render does not pay for it."""
+        for _ in range(self.workers):
+            self._executor.submit(_ready)
+
+    def submit(self, option_type, params, figsize=(8, 6), fmt='png', dpi=100, timeout=None,
+               **savefig_kwargs):
+        """Queues one render and returns a Future of the image bytes.
+
+        Blocks while max_pending renders are outstanding; raises TimeoutError if
+        no slot frees up within `timeout` seconds (None waits indefinitely).
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"渲染队列已满（{self.max_pending}）")
+        job = (_render, option_type, dict(params), tuple(figsize), fmt, dpi, savefig_kwargs)
+        result = Future()
+
+        def start(retry):
+            executor = self._executor
+            try:
+                future = executor.submit(*job)
+            except BrokenProcessPool:
+                if not retry:
+                    raise
+                self._restart(executor)
+                start(False)
+                return
+            future.add_done_callback(lambda future: done(future, executor, retry))
+
+        def done(future, executor, retry):
+            try:
+                pid, stats, data = future.result()
+            except BrokenProcessPool as e:
+                error = e
+                if retry:
+                    self._restart(executor)
+                    try:
+                        start(False)
+                        return
+                    except BaseException as retry_error:
+                        error = retry_error
+                self._slots.release()
+                result.set_exception(error)
+                return
+            except BaseException as e:
+                self._slots.release()
+                result.set_exception(e)
+                return
+            self._slots.release()
+            self._figure_stats[pid] = stats
+            result.set_result(data)
+
+        try:
+            start(True)
+        except BaseException:
+            self._slots.release()
+            raise
+        return result
+
+    def render(self, option_type, params, figsize=(8, 6), fmt='png', dpi=100, timeout=None,
+               **savefig_kwargs):
+        """Renders one chart and returns its bytes; see submit for the arguments."""
+        return self.submit(option_type, params, figsize, fmt, dpi, timeout, **savefig_kwargs).result()
+
+    def figure_stats(self):
+        """Figure counts summed over the workers' latest reports (workers that have not rendered yet count as empty)."""
+        reports = list(self._figure_stats.values())
+        totals = {key: sum(r[key] for r in reports)
+                  for key in ('figures', 'in_use', 'bytes', 'hits', 'misses', 'evictions')}
+        return {'workers': len(reports), 'max_bytes_per_worker': self.figure_bytes, **totals}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
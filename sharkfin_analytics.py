@@ -0,0 +1,131 @@
+"""Closed-form knock-out statistics for the sharkfin (单鲨/价差) book.
+
+Everything is vectorized over products: pass NumPy arrays (one entry per
+product) and get arrays back, with no Python loop over the book.
+
+Under risk-neutral GBM the log-price X_T = ln(S_T/S_0) is normal, and the
+reflection principle gives the density of X_T on paths that never touched a
+barrier b as φ(x; μT) − exp(2μb/σ²) φ(x; 2b + μT). The payoffs of payoff.py
+are piecewise (constant or linear in S_T), so their expectations against that
+density reduce to normal CDFs. Daily observation is handled with the
+Broadie–Glasserman–Kou correction, which moves the barrier away from the spot
+by exp(0.5826 σ √Δt).
+"""
+import numpy as np
+
+from payoff import batch_tenor_years, charted_participation
+
+BGK_BETA = 0.5826
+
+
+def norm_cdf(x):
+    """Standard normal CDF, vectorized (Chebyshev erfc, relative error < 1.2e-7)."""
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    erfc = t * np.exp(-z * z + poly)
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def norm_pdf(x):
+    """Standard normal density."""
+    return np.exp(-0.5 * np.square(x)) / np.sqrt(2.0 * np.pi)
+
+
+def bs_forward(call, strike, tenor, sigma, r=0.0, q=0.0):
+    """Undiscounted Black–Scholes option value on S0 = 1, vectorized.
+
+    strike is a price ratio (1.0 = at the money) and call a bool array.
+    Returns (value, d1, d2) so callers can reuse the d terms.
+    """
+    forward = np.exp((r - q) * tenor)
+    s = sigma * np.sqrt(tenor)
+    d1 = (np.log(forward / strike) + 0.5 * s * s) / s
+    d2 = d1 - s
+    call_value = forward * norm_cdf(d1) - strike * norm_cdf(d2)
+    put_value = strike * norm_cdf(-d2) - forward * norm_cdf(-d1)
+    return np.where(call, call_value, put_value), d1, d2
+
+
+def _piece(alpha, beta, c, lo, hi, m, s):
+    """∫_lo^hi (alpha + beta·e^{c·y}) φ(y; m, s²) dy."""
+    prob = norm_cdf((hi - m) / s) - norm_cdf((lo - m) / s)
+    shift = m + c * s * s
+    exp_part = np.exp(c * m + 0.5 * c * c * s * s) * (norm_cdf((hi - shift) / s) - norm_cdf((lo - shift) / s))
+    return alpha * prob + beta * exp_part
+
+
+def sharkfin_stats(params, call, tenor=None, sigma=0.2, r=0.0, q=0.0, obs_per_year=252):
+    """Knock-out probability, expected return and break-even for many sharkfins at once.
+
+    params  dict of arrays with strike, knock_out, participation_rate, min_ret,
+            knock_ret (all in %) and type ('单鲨' or '价差'), e.g. from
+            payoff.stack_params(rows, column=False); with max_ret the slope
+            follows from it (payoff.charted_participation)
+    call    bool array, True for 看涨 (up-and-out) and False for 看跌 (down-and-out)
+    tenor   years to maturity; parsed from params['month'] when omitted
+            (NaN results for rows whose 期限 cannot be parsed)
+    sigma, r, q
+            volatility, rate and carry, scalars or arrays
+
+    Returns a dict of arrays:
+      knock_out_prob    probability of touching the barrier on an observation day
+                        (0 for 价差, which has no barrier)
+      expected_return   risk-neutral expected annualised return, %
+      present_value     expected return × tenor, discounted at r, % of notional
+      break_even        final-price ratio at which holding the underlying earns the
+                        same annualised return as expected_return (rising for
+                        calls, falling for puts)
+    """
+    call = np.asarray(call, dtype=bool)
+    if tenor is None:
+        tenor = batch_tenor_years(params['month'])
+    tenor = np.asarray(tenor, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    shark = np.asarray(params['type']) == '单鲨'
+
+    k = np.asarray(params['strike'], dtype=float) / 100.0
+    h = np.asarray(params['knock_out'], dtype=float) / 100.0
+    pr = charted_participation(params)
+    min_ret = np.asarray(params['min_ret'], dtype=float)
+    knock_ret = np.asarray(params['knock_ret'], dtype=float)
+
+    # Work in y = ±X so that the barrier is always an up barrier: puts are mirrored.
+    sign = np.where(call, 1.0, -1.0)
+    mu = sign * (r - q - 0.5 * sigma ** 2)
+    s = sigma * np.sqrt(tenor)
+    m1 = mu * tenor
+    a = sign * np.log(k)
+    cap = sign * np.log(h)
+    shift = BGK_BETA * sigma * np.sqrt(1.0 / obs_per_year)
+    b = np.where(shark, cap + shift, np.inf)
+    b_refl = np.where(shark, b, 0.0)
+    lam = np.where(shark, np.exp(2.0 * mu * b_refl / sigma ** 2), 0.0)
+    m2 = 2.0 * b_refl + m1
+
+    # payoff pieces in y-space: flat at min_ret, linear in S_T up to the cap, flat after it
+    capped = min_ret + pr * sign * (h - k)
+    pieces = [
+        (min_ret, 0.0, -np.inf, a),
+        (min_ret - pr * sign * k, pr * sign, a, np.minimum(cap, b)),
+        (capped, 0.0, cap, b),
+    ]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        expected = np.zeros(np.broadcast(k, tenor, sigma).shape)
+        for alpha, beta, lo, hi in pieces:
+            hi = np.maximum(hi, lo)
+            expected = expected + _piece(alpha, beta, sign, lo, hi, m1, s)
+            expected = expected - lam * np.where(shark, _piece(alpha, beta, sign, lo, hi, m2, s), 0.0)
+        survive = norm_cdf((b - m1) / s) - lam * np.where(shark, norm_cdf((b_refl - m2) / s), 0.0)
+
+    knock_out_prob = np.where(shark, 1.0 - survive, 0.0)
+    expected = expected + knock_out_prob * knock_ret
+    return {
+        'knock_out_prob': knock_out_prob,
+        'expected_return': expected,
+        'present_value': expected * tenor * np.exp(-r * tenor),
+        'break_even': 1.0 + sign * expected * tenor / 100.0,
+    }
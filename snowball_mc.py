@@ -0,0 +1,219 @@
+"""Monte Carlo pricer for the 三元小雪球 (monthly knock-out, daily knock-in snowball).
+
+Paths are geometric Brownian motion in the risk-neutral measure, simulated as
+batched NumPy arrays of log-prices. Knock-out is checked on the monthly
+observation dates and knock-in on every trading day. Paths are generated in
+fixed-size chunks, so memory stays bounded however many paths are requested.
+
+Payoffs follow payoff.snowball_payoff: ret3 if the product knocks out (and
+stops at that observation date), otherwise ret1 if it ever knocked in and ret2
+if it did not. All returns are annualised percentages.
+"""
+import numpy as np
+
+from payoff import tenor_months
+
+DAYS_PER_MONTH = 21
+
+
+def _chunk_sizes(n_paths, chunk_size):
+    while n_paths > 0:
+        n = min(chunk_size, n_paths)
+        yield n
+        n_paths -= n
+
+
+def simulate_snowball(params, sigma, r=0.0, q=0.0, n_paths=1_000_000, chunk_size=1 << 15,
+                      antithetic=True, seed=None, days_per_month=DAYS_PER_MONTH):
+    """Simulates one snowball and returns a dict of summary statistics.
+
+    params      a 三元小雪球 param dict (knock_in/knock_out in % of the initial price)
+    sigma       annualised volatility, e.g. 0.22
+    r, q        continuously compounded rate and dividend/carry yield
+    antithetic  pair every normal draw with its negation; the standard error is
+                then computed over pair averages
+
+    Returned keys: expected_return (annualised %), std_error, knock_out_prob,
+    knock_in_prob (knocked in and never knocked out), expected_life (years),
+    expected_absolute_return (annualised return × time held, %), present_value
+    (the absolute return discounted at r), knock_out_by_month and n_paths.
+    """
+    n_months = int(round(tenor_months(params['month'])))
+    if n_months < 1:
+        raise ValueError(f"期限不足一个月: {params['month']!r}")
+    dt = 1.0 / (12 * days_per_month)
+
+    if antithetic:
+        n_paths += n_paths % 2
+        chunk_size += chunk_size % 2
+
+    log_ki = np.float32(np.log(params['knock_in'] / 100.0))
+    log_ko = np.float32(np.log(params['knock_out'] / 100.0))
+    ret1, ret2, ret3 = params['ret1'], params['ret2'], params['ret3']
+    step_drift = (r - q - 0.5 * sigma ** 2) * dt
+    day_drift = (step_drift * np.arange(1, days_per_month + 1)).astype(np.float32)
+    vol = np.float32(sigma * np.sqrt(dt))
+    life_years = np.arange(1, n_months + 1) / 12.0
+    discount = np.exp(-r * life_years)
+    signs = np.array([1, -1] if antithetic else [1], dtype=np.float32)[:, None, None]
+    legs = len(signs)
+
+    rng = np.random.default_rng(seed)
+    total = total_sq = total_abs = total_pv = total_life = 0.0
+    n_ki = 0
+    ko_counts = np.zeros(n_months + 1, dtype=np.int64)
+
+    for n in _chunk_sizes(n_paths, chunk_size):
+        # One row per normal draw; with antithetic variates each row drives two legs.
+        # Only rows with a live leg are kept, and a leg's return is booked as soon as
+        # it knocks out, so the arrays shrink as the months go by.
+        rows = n // legs
+        log_s = np.zeros((legs, rows), dtype=np.float32)
+        knocked_in = np.zeros((legs, rows), dtype=bool)
+        done = np.zeros((legs, rows), dtype=bool)
+        row_ret = np.zeros(rows)
+
+        for month in range(n_months):
+            w = rng.standard_normal((log_s.shape[1], days_per_month), dtype=np.float32)
+            np.cumsum(w, axis=1, out=w)
+            w *= vol
+            path = signs * w
+            path += day_drift
+            path += log_s[:, :, None]
+            knocked_in |= path.min(axis=2) < log_ki
+            log_s = path[:, :, -1]
+
+            out = ~done & (log_s >= log_ko)
+            count = np.count_nonzero(out)
+            held = life_years[month]
+            ko_counts[month + 1] += count
+            total += ret3 * count
+            total_abs += ret3 * held * count
+            total_pv += ret3 * held * discount[month] * count
+            total_life += held * count
+            row_ret += ret3 * out.sum(axis=0)
+            done |= out
+
+            finished = done.all(axis=0)
+            if finished.any():
+                total_sq += np.square(row_ret[finished] / legs).sum()
+                keep = ~finished
+                log_s, knocked_in, done, row_ret = log_s[:, keep], knocked_in[:, keep], done[:, keep], row_ret[keep]
+            if not row_ret.size:
+                break
+
+        # whatever is left was held to maturity without knocking out
+        alive = ~done
+        ret = np.where(knocked_in, ret1, ret2) * alive
+        held = life_years[-1]
+        count = np.count_nonzero(alive)
+        total += ret.sum()
+        total_abs += ret.sum() * held
+        total_pv += ret.sum() * held * discount[-1]
+        total_life += held * count
+        n_ki += np.count_nonzero(knocked_in & alive)
+        row_ret += ret.sum(axis=0)
+        # antithetic pairs are not independent, so the variance is taken over pair means
+        total_sq += np.square(row_ret / legs).sum()
+
+    n_samples = n_paths // 2 if antithetic else n_paths
+    mean = total / n_paths
+    variance = max(total_sq / n_samples - mean ** 2, 0.0)
+    return {
+        'expected_return': mean,
+        'std_error': np.sqrt(variance / n_samples),
+        'knock_out_prob': ko_counts[1:].sum() / n_paths,
+        'knock_in_prob': n_ki / n_paths,
+        'expected_life': total_life / n_paths,
+        'expected_absolute_return': total_abs / n_paths,
+        'present_value': total_pv / n_paths,
+        'knock_out_by_month': ko_counts[1:] / n_paths,
+        'n_paths': n_paths,
+    }
+
+
+def snowball_leg_values(legs, n_paths=200_000, chunk_size=1 << 18, antithetic=True, seed=None,
+                        days_per_month=DAYS_PER_MONTH):
+    """Present values of many snowball legs simulated on common random numbers.
+
+    `legs` is a dict of equal-length arrays, one entry per leg:
+      knock_in, knock_out, ret1, ret2, ret3   as in the param dicts (%)
+      months                                  tenor in whole months
+      sigma, r, q                             per-leg market data
+      shift                                   log spot shift, ln(S/S0)
+      offset                                  trading days already elapsed, which
+                                              moves every observation date earlier
+
+    Every leg is driven by the same normals, so differences between legs (spot,
+    vol or time bumps of one product) carry very little Monte Carlo noise. The
+    present value is annualised return × time held from inception (years),
+    discounted over the time remaining, in % of notional.
+    """
+    legs = {key: np.asarray(value) for key, value in legs.items()}
+    n_legs = legs['months'].size
+    months = legs['months'].astype(int)
+    offset = legs['offset'].astype(int)
+    sigma = legs['sigma'].astype(float)
+    dt = 1.0 / (12 * days_per_month)
+
+    if antithetic:
+        n_paths += n_paths % 2
+    signs = np.array([1, -1] if antithetic else [1], dtype=np.float32)[:, None, None, None]
+    n_sides = signs.shape[0]
+    rows_per_chunk = max(1, chunk_size // (n_sides * n_legs * days_per_month))
+
+    col = (slice(None), None)
+    log_ki = np.log(legs['knock_in'] / 100.0).astype(np.float32)[col]
+    log_ko = np.log(legs['knock_out'] / 100.0).astype(np.float32)[col]
+    day = np.arange(1, days_per_month + 1)
+    drift = (((legs['r'] - legs['q'] - 0.5 * sigma ** 2) * dt)[:, None] * day).astype(np.float32)[:, None, :]
+    vol = (sigma * np.sqrt(dt)).astype(np.float32)[:, None, None]
+    # a leg `offset` days in observes that many days before the end of each block
+    obs_idx = (days_per_month - 1 - offset)[None, :, None, None]
+
+    def settle(ret, month_end, count_mask):
+        # month_end: months since inception at which the leg pays (per leg)
+        accrual = month_end / 12.0
+        remaining = accrual - offset * dt
+        return (ret * count_mask).sum(axis=(0, 2)) * accrual * np.exp(-legs['r'] * remaining)
+
+    rng = np.random.default_rng(seed)
+    totals = np.zeros(n_legs)
+    remaining_paths = n_paths
+    while remaining_paths > 0:
+        rows = min(rows_per_chunk, remaining_paths // n_sides)
+        remaining_paths -= rows * n_sides
+        log_s = np.zeros((n_sides, n_legs, rows), dtype=np.float32) + legs['shift'].astype(np.float32)[:, None]
+        knocked_in = np.zeros((n_sides, n_legs, rows), dtype=bool)
+        done = np.zeros((n_sides, n_legs, rows), dtype=bool)
+
+        for month in range(months.max()):
+            w = rng.standard_normal((log_s.shape[2], days_per_month), dtype=np.float32)
+            np.cumsum(w, axis=1, out=w)
+            path = signs * (vol * w)
+            path += drift[None]
+            path += log_s[..., None]
+            last = month == months - 1
+            # on its final month a leg that started `offset` days late stops early
+            valid = ~(last[:, None] & (day[None, :] > days_per_month - offset[:, None]))
+            day_min = np.where(valid[None, :, None, :], path, np.inf).min(axis=3)
+            knocked_in |= (day_min < log_ki) & (month < months)[:, None]
+            at_obs = np.take_along_axis(path, obs_idx, axis=3)[..., 0]
+            log_s = path[..., -1]
+
+            active = ~done & (month < months)[:, None]
+            out = active & (at_obs >= log_ko)
+            totals += settle(legs['ret3'][:, None], np.full(n_legs, month + 1.0), out)
+            done |= out
+            matured = active & ~out & last[:, None]
+            ret = np.where(knocked_in, legs['ret1'][:, None], legs['ret2'][:, None])
+            totals += settle(ret, months.astype(float), matured)
+            done |= matured
+
+            keep = ~done.all(axis=(0, 1))
+            if not keep.all():
+                log_s, knocked_in, done = log_s[..., keep], knocked_in[..., keep], done[..., keep]
+            if not keep.any():
+                break
+
+    return totals / (n_paths - remaining_paths)
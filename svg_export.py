@@ -0,0 +1,222 @@
+"""SVG export straight from the chart geometry, without matplotlib.
+
+A payoff chart is a few polylines, labels and ticks (option_charts.chart_geometry,
+the vertex logic the five plot functions draw). For bulk exports the matplotlib
+pipeline (artists, text layout, the SVG backend) costs far more than the chart
+itself, so export_svg fills a per-structure template instead:
+
+    data = export_svg('看涨香草', params)            # bytes of a standalone SVG
+
+The static part of each structure's chart (frame, legend, xlabel, styles) is
+compiled once per (structure, figure size) into a string.Template. Each
+export only substitutes the vertices, ticks, labels and title into it. The
+result follows the matplotlib chart's look; margins are fixed instead of
+measured.
+
+SimHei is embedded as a WOFF @font-face, subset with fontTools to the
+characters of that chart plus printable ASCII, so the same chart always gives
+the same bytes. Subsets are cached per character set: numeric edits reuse one,
+and only a new title or asset name builds another. Without the font file, the
+SVG names SimHei and relies on it being installed. Embedding needs fonttools.
+
+export_chart dispatches on the format: SVG goes through the template, and any
+other format (PDF, PNG) is rendered by matplotlib.
+"""
+import base64
+import html
+import io
+import os
+import string
+from collections import OrderedDict
+from functools import lru_cache
+
+from option_charts import chart_geometry, geometry_xlim, get_initial_data, new_figure, render_chart
+
+LINE_COLOR = '#FF6B6B'
+TITLE_COLOR = '#2C3E50'
+FONT_FAMILY = 'SimHei'
+MARGINS = (54, 60, 18, 48)  # left, top, right, bottom in points
+LINE_SPACING = 1.2  # of the font size, for the two-line title
+LEGEND_LABEL = '收益结构曲线'
+BASE_CHARS = frozenset(string.printable)  # in every subset, so numeric edits reuse it
+SUBSET_CACHE_SIZE = 64
+
+
+class FontSubset:
+    """fontTools subsets of one font as ready-to-embed CSS @font-face rules, cached per character set."""
+
+    def __init__(self, font_path='SimHei.ttf'):
+        self.font_path = font_path
+        self._css = OrderedDict()  # frozenset of characters -> CSS, least recently used first
+        self.ascent, self.descent = 0.86, 0.14  # as fractions of the em, until the font is read
+        self._data = None
+        if os.path.exists(font_path):
+            with open(font_path, 'rb') as f:
+                self._data = f.read()
+            font = self._load()
+            em = font['head'].unitsPerEm
+            self.ascent = font['hhea'].ascent / em
+            self.descent = -font['hhea'].descent / em
+
+    def _load(self):
+        try:
+            from fontTools.ttLib import TTFont
+        except ImportError as e:  # optional dependency
+            raise ImportError("在SVG中嵌入字体需要安装fonttools") from e
+        return TTFont(io.BytesIO(self._data))
+
+    def cover(self, text):
+        """The @font-face CSS of a subset with exactly the characters of `text` and BASE_CHARS.
+
+        Returns '' without the font file.
+        """
+        if self._data is None:
+            return ''
+        chars = BASE_CHARS.union(text)
+        css = self._css.get(chars)
+        if css is None:
+            css = self._css[chars] = self._build(chars)
+            if len(self._css) > SUBSET_CACHE_SIZE:
+                self._css.popitem(last=False)
+        else:
+            self._css.move_to_end(chars)
+        return css
+
+    def _build(self, chars):
+        from fontTools import subset
+
+        options = subset.Options()
+        options.flavor = 'woff'
+        options.layout_features = ['*']
+        options.drop_tables += ['FFTM']  # FontForge timestamps, unknown to the subsetter
+        font = self._load()
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=''.join(sorted(chars)))
+        subsetter.subset(font)
+        font.flavor = 'woff'
+        buf = io.BytesIO()
+        font.save(buf)
+        encoded = base64.b64encode(buf.getvalue()).decode('ascii')
+        return ("@font-face{font-family:'%s';src:url(data:font/woff;base64,%s) format('woff');}"
+                    % (FONT_FAMILY, encoded))
+
+
+_subsets = {}
+
+
+def font_subset(font_path='SimHei.ttf'):
+    """The process-wide FontSubset for `font_path`."""
+    subset = _subsets.get(font_path)
+    if subset is None:
+        subset = _subsets[font_path] = FontSubset(font_path)
+    return subset
+
+
+def _text(x, y, text, size, ha, va, font, color='black'):
+    """An SVG <text> at (x, y) aligned like matplotlib's ha/va."""
+    lines = text.split('\n')
+    if va == 'top':
+        y += font.ascent * size
+    elif va == 'center':
+        y += (font.ascent - font.descent) / 2 * size - (len(lines) - 1) * LINE_SPACING * size / 2
+    elif va == 'bottom':
+        y -= font.descent * size + (len(lines) - 1) * LINE_SPACING * size
+    anchor = {'left': 'start', 'center': 'middle', 'right': 'end'}[ha]
+    # one <text> per line: tspan offsets are not supported by every SVG renderer
+    return ''.join(f'<text x="{x:.2f}" y="{y + i * LINE_SPACING * size:.2f}" font-size="{size}" '
+                   f'text-anchor="{anchor}" fill="{color}">{html.escape(line)}</text>'
+                   for i, line in enumerate(lines))
+
+
+@lru_cache(maxsize=64)
+def _template(option_type, figsize, font_path):
+    """Compiles the static part of one structure's chart into a string.Template."""
+    width, height = figsize[0] * 72, figsize[1] * 72
+    left, top, right, bottom = MARGINS
+    plot_w, plot_h = width - left - right, height - top - bottom
+    font = font_subset(font_path)
+    label, ha, labelpad = chart_geometry(option_type, get_initial_data()[option_type]['params'])['xlabel']
+    static = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}pt" height="{height}pt" '
+        f'viewBox="0 0 {width} {height}">',
+        f"<style>${{font_css}}text{{font-family:'{FONT_FAMILY}',sans-serif}}</style>",
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<defs><clipPath id="plot"><rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}"/>'
+        '</clipPath></defs>',
+        '<g stroke="#b0b0b0" stroke-opacity="0.5" stroke-width="0.8" stroke-dasharray="0.8,1.32">${grid}</g>',
+        '<g clip-path="url(#plot)" stroke="black" stroke-width="0.8">${refs}</g>',
+        f'<g clip-path="url(#plot)" fill="none" stroke="{LINE_COLOR}" stroke-width="2" '
+        'stroke-linejoin="round">${lines}</g>',
+        f'<g fill="{LINE_COLOR}">${{markers}}</g>',
+        f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="grey"/>',
+        '<g stroke="black" stroke-width="0.8">${ticks}</g>',
+        '${labels}',
+        # the xlabel and the legend are the same for every product of a structure
+        _text(left + plot_w / 2, height - bottom + 4 + 11 + labelpad, label, 10, ha, 'top', font)
+        .replace('$', '$$'),
+        f'<line x1="{left + 6}" y1="{top + 12}" x2="{left + 26}" y2="{top + 12}" '
+        f'stroke="{LINE_COLOR}" stroke-width="2"/>'
+        f'<circle cx="{left + 16}" cy="{top + 12}" r="2.5" fill="{LINE_COLOR}"/>',
+        _text(left + 32, top + 12, LEGEND_LABEL, 10, 'left', 'center', font),
+        '${title}</svg>',
+    ]
+    return string.Template(''.join(static))
+
+
+def export_svg(option_type, params, figsize=(8, 6), embed_font=True, font_path='SimHei.ttf'):
+    """Returns the UTF-8 bytes of a standalone SVG chart for one product."""
+    figsize = tuple(figsize)
+    template = _template(option_type, figsize, font_path)
+    geom = chart_geometry(option_type, params)
+    font = font_subset(font_path)
+
+    width, height = figsize[0] * 72, figsize[1] * 72
+    left, top, right, bottom = MARGINS
+    plot_w, plot_h = width - left - right, height - top - bottom
+    (x0, x1), (y0, y1) = geometry_xlim(geom), geom['ylim']
+
+    def px(x):
+        return left + (x - x0) / (x1 - x0) * plot_w
+
+    def py(y):
+        return top + plot_h - (y - y0) / (y1 - y0) * plot_h
+
+    xticks, xlabels, xsize = geom['xticks']
+    yticks, ylabels, ysize = geom['yticks']
+    base = top + plot_h
+    grid = ''.join([f'<line x1="{px(x):.2f}" y1="{top}" x2="{px(x):.2f}" y2="{base}"/>' for x in xticks]
+                   + [f'<line x1="{left}" y1="{py(y):.2f}" x2="{left + plot_w}" y2="{py(y):.2f}"/>'
+                      for y in yticks])
+    refs = f'<line x1="{left}" y1="{py(0):.2f}" x2="{left + plot_w}" y2="{py(0):.2f}"/>'
+    if geom['vline'] is not None:
+        refs += f'<line x1="{px(geom["vline"]):.2f}" y1="{top}" x2="{px(geom["vline"]):.2f}" y2="{base}"/>'
+    lines, markers = [], []
+    for xs, ys, marker in geom['lines']:
+        points = [(px(x), py(y)) for x, y in zip(xs, ys)]
+        lines.append('<polyline points="%s"/>' % ' '.join(f'{x:.2f},{y:.2f}' for x, y in points))
+        if marker:
+            markers.extend(f'<circle cx="{x:.2f}" cy="{y:.2f}" r="2.5"/>' for x, y in points)
+    ticks = ''.join([f'<line x1="{px(x):.2f}" y1="{base}" x2="{px(x):.2f}" y2="{base + 3.5}"/>' for x in xticks]
+                    + [f'<line x1="{left - 3.5}" y1="{py(y):.2f}" x2="{left}" y2="{py(y):.2f}"/>' for y in yticks])
+    labels = ''.join([_text(px(x), base + 5, label, xsize, 'center', 'top', font)
+                      for x, label in zip(xticks, xlabels)]
+                     + [_text(left - 5, py(y), label, ysize, 'right', 'center', font)
+                        for y, label in zip(yticks, ylabels)]
+                     + [_text(px(x), py(y), text, 12, ha, va, font)
+                        for x, y, text, ha, va in geom['texts'] if text])
+    title = _text(left + plot_w / 2, top - 20, geom['title'], 14, 'center', 'bottom', font, TITLE_COLOR)
+
+    font_css = ''
+    if embed_font:
+        font_css = font.cover(geom['title'] + geom['xlabel'][0] + LEGEND_LABEL + ''.join(xlabels)
+                              + ''.join(ylabels) + ''.join(text for *_, text, _, _ in geom['texts']))
+    svg = template.substitute(font_css=font_css, grid=grid, refs=refs, lines=''.join(lines),
+                          markers=''.join(markers), ticks=ticks, labels=labels, title=title)
+    return svg.encode('utf-8')
+
+
+def export_chart(option_type, params, fmt='svg', figsize=(8, 6), dpi=100, fig=None, **kwargs):
+    """SVG through the template; other formats (PDF, PNG) through matplotlib on `fig` or a new figure."""
+    if fmt == 'svg':
+        return export_svg(option_type, params, figsize, **kwargs)
+    return render_chart(fig or new_figure(figsize), option_type, params, fmt=fmt, dpi=dpi)
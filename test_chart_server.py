@@ -0,0 +1,69 @@
+"""Malformed render requests must get a 400, never a 500 or a hung connection."""
+import http.client
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from chart_server import ChartRequestHandler
+from option_charts import get_initial_data
+
+
+@pytest.fixture(scope='module')
+def port():
+    # no cache or render pool: every request here is rejected before rendering
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ChartRequestHandler)
+    server.daemon_threads = True
+    server.verbose = False
+    server.defaults = get_initial_data()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def post(port, body, content_type='application/json'):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('POST', '/render', body=body.encode('utf-8'), headers={'Content-Type': content_type})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('body', [
+    '[1, 2]',
+    'not json {',
+    '{"option_type": []}',
+    '{"option_type": "未知结构"}',
+    '{"option_type": "看涨香草", "params": []}',
+    '{"option_type": "看涨香草", "params": {"strike": "abc"}}',
+    '{"option_type": "看涨香草", "params": {"strike": NaN}}',
+    '{"option_type": "看涨香草", "params": {"strike": "inf"}}',
+    '{"option_type": "看涨香草", "params": {"asset": [1]}}',
+    '{"option_type": "看涨香草", "figsize": 5}',
+    '{"option_type": "看涨香草", "dpi": null}',
+    '{"option_type": "看涨香草", "dpi": 1e400}',
+    '{"option_type": "看涨香草", "format": "gif"}',
+])
+def test_malformed_json_is_400(port, body):
+    status, payload = post(port, body)
+    assert status == 400
+    assert payload['error']
+
+
+def test_malformed_text_is_400(port):
+    status, _ = post(port, '结构\t行权价\n看涨香草\tnan%\n', 'text/tab-separated-values')
+    assert status == 400
+
+
+@pytest.mark.parametrize('length', ['-1', 'abc'])
+def test_bad_content_length_is_400(port, length):
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as sock:
+        sock.sendall(f'POST /render HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n'.encode())
+        status_line = sock.makefile('rb').readline()
+    assert status_line.split()[1] == b'400'
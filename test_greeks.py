@@ -0,0 +1,24 @@
+"""Greeks must agree with bumping the inputs and repricing."""
+import numpy as np
+import pytest
+
+from greeks import greeks
+from option_charts import get_initial_data
+from payoff import stack_params
+
+STRUCTURES = ['看涨香草', '看涨单鲨/价差', '看跌单鲨/价差', '看涨敲出']
+
+
+def _book(option_type):
+    base = get_initial_data()[option_type]['params']
+    return stack_params([dict(base, month='6M'), dict(base, month='1Y')], column=False)
+
+
+@pytest.mark.parametrize('option_type', STRUCTURES)
+def test_vega_matches_bump_and_reprice(option_type):
+    params, sigma, bump = _book(option_type), 0.2, 0.01
+    vega = greeks(option_type, params, sigma, r=0.02)['vega']
+    up = greeks(option_type, params, sigma + bump, r=0.02)['value']
+    down = greeks(option_type, params, sigma - bump, r=0.02)['value']
+    np.testing.assert_allclose(vega, (up - down) / (2 * bump), rtol=1e-3, atol=1e-3)
+
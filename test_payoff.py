@@ -0,0 +1,72 @@
+"""The payoff engine must reproduce the lines the charts draw, for every structure."""
+import numpy as np
+import pytest
+
+from option_charts import chart_geometry, get_initial_data
+from sharkfin_analytics import sharkfin_stats
+from payoff import batch_tenor_years, payoff, stack_params, tenor_months
+
+PRODUCTS = [(option_type, item['params']) for option_type, item in get_initial_data().items()]
+PRODUCTS += [
+    ('看涨单鲨/价差', dict(PRODUCTS[0][1], type='价差')),
+    ('看跌单鲨/价差', dict(PRODUCTS[1][1], type='价差', strike=98.0)),
+    ('看涨香草', dict(PRODUCTS[4][1], strike=95.0)),
+]
+
+
+def drawn_segments(option_type, params):
+    """(x0, y0, x1, y1) of every drawn segment the payoff covers."""
+    geom = chart_geometry(option_type, params)
+    beyond = 1 if option_type == '看涨单鲨/价差' else -1
+    for xs, ys, _ in geom['lines']:
+        for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+            # a 价差 is capped at max_ret past the barrier; the chart still draws knock_ret there, unlabelled
+            if params.get('type') == '价差' and beyond * (x0 + x1 - 2 * params['knock_out']) > 0:
+                continue
+            yield x0, y0, x1, y1
+
+
+@pytest.mark.parametrize('option_type, params', PRODUCTS, ids=[f'{t}-{p.get("type", "")}' for t, p in PRODUCTS])
+def test_payoff_matches_chart_vertices(option_type, params):
+    # interior points only: at a barrier the two sides of a jump are both drawn
+    t = np.array([1e-6, 0.25, 0.5, 0.75, 1 - 1e-6])
+    for x0, y0, x1, y1 in drawn_segments(option_type, params):
+        x = x0 + t * (x1 - x0)
+        expected = y0 + t * (y1 - y0)
+        np.testing.assert_allclose(payoff(option_type, params, x / 100.0), expected, atol=1e-4,
+                                   err_msg=f'{option_type} segment {x0}..{x1}')
+
+
+def test_default_call_sharkfin_peaks_at_max_ret():
+    option_type, params = PRODUCTS[0]
+    x = np.linspace(90, 107.999, 1000) / 100.0
+    assert np.max(payoff(option_type, params, x)) == pytest.approx(params['max_ret'], abs=1e-3)
+
+
+def test_stacked_params_match_single_rows():
+    option_type, params = PRODUCTS[0]
+    rows = [params, dict(params, max_ret=6.0), dict(params, type='价差')]
+    x = np.linspace(0.9, 1.2, 50)
+    stacked = payoff(option_type, stack_params(rows), x)
+    for i, row in enumerate(rows):
+        np.testing.assert_allclose(stacked[i], payoff(option_type, row, x))
+
+
+@pytest.mark.parametrize('month, months', [('24M', 24.0), ('1Y', 12.0), ('90D', 90 * 12 / 365), (' 6m ', 6.0)])
+def test_tenor_months(month, months):
+    assert tenor_months(month) == pytest.approx(months)
+
+
+def test_month_label_is_not_an_expiry():
+    # '2025-07' names the product; it must not be read as a maturity, past or future
+    for label in ('2025-07', '2099-12'):
+        with pytest.raises(ValueError):
+            tenor_months(label)
+    np.testing.assert_array_equal(np.isnan(batch_tenor_years(['6M', '2025-07', '1Y'])), [False, True, False])
+
+
+def test_unparseable_tenor_prices_as_nan():
+    base = get_initial_data()['看涨单鲨/价差']['params']
+    params = stack_params([dict(base, month='6M'), base], column=False)
+    value = sharkfin_stats(params, np.ones(2, dtype=bool))['present_value']
+    assert np.isfinite(value[0]) and np.isnan(value[1])
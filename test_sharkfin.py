@@ -0,0 +1,22 @@
+"""The closed-form sharkfin pricer and the PDE pricer must agree on the default book."""
+import numpy as np
+import pytest
+
+from option_charts import get_initial_data
+from payoff import stack_params
+from sharkfin_analytics import sharkfin_stats
+from sharkfin_pde import price_sharkfin_book
+
+
+@pytest.mark.parametrize('option_type', ['看涨单鲨/价差', '看跌单鲨/价差'])
+def test_analytic_matches_pde(option_type):
+    base = get_initial_data()[option_type]['params']
+    rows = [dict(base, type=kind, month=month) for kind in ('单鲨', '价差') for month in ('3M', '1Y')]
+    params = stack_params(rows, column=False)
+    call = np.full(len(rows), option_type == '看涨单鲨/价差')
+
+    analytic = sharkfin_stats(params, call, sigma=0.2, r=0.02)
+    pde = price_sharkfin_book(params, call, sigma=0.2, r=0.02)
+    np.testing.assert_allclose(analytic['present_value'], pde['present_value'], rtol=5e-3)
+    np.testing.assert_allclose(analytic['expected_return'], pde['expected_return'], rtol=5e-3)
+
@@ -0,0 +1,133 @@
+"""Lightweight timing spans for the chart update/render pipeline.
+
+    from tracing import span
+
+    with span('canvas.draw'):
+        canvas.draw()
+
+Tracing is off unless enable() is called or CHART_TRACE=1 is set in the
+environment. While it is off, span() returns one shared no-op context manager,
+so an instrumented stage costs a global lookup and a function call and the
+spans can stay in production code.
+
+While it is on, every span records its duration. The last MAX_SAMPLES
+durations per name feed summary() (count and p50/p90/p99/max in ms), and the
+last MAX_EVENTS spans of all names can be written as a Chrome trace
+(chrome://tracing or https://ui.perfetto.dev), where nested spans are stacked
+per thread. Spans from several threads may be recorded at once; worker
+processes keep their own, separate records.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_SAMPLES = 2048  # durations kept per span name for the percentiles
+MAX_EVENTS = 20000  # spans kept for the Chrome trace
+
+_enabled = os.environ.get('CHART_TRACE', '') not in ('', '0')
+_samples = {}
+_events = deque(maxlen=MAX_EVENTS)
+_lock = threading.Lock()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+def span(name):
+    """Context manager timing one stage called `name`; a no-op while tracing is off."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def record(name, start_ns, end_ns):
+    """Records a finished span from perf_counter_ns() timestamps."""
+    samples = _samples.get(name)
+    if samples is None:
+        with _lock:
+            samples = _samples.setdefault(name, deque(maxlen=MAX_SAMPLES))
+    samples.append(end_ns - start_ns)
+    _events.append((name, start_ns, end_ns - start_ns, threading.get_ident()))
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drops everything recorded so far."""
+    with _lock:
+        _samples.clear()
+        _events.clear()
+
+
+def _percentile(ordered, q):
+    return ordered[round(q * (len(ordered) - 1))]
+
+
+def summary():
+    """Returns {name: {'count', 'p50', 'p90', 'p99', 'max'}} over the recent spans, in ms."""
+    result = {}
+    for name, samples in list(_samples.items()):
+        ordered = sorted(samples)
+        if not ordered:
+            continue
+        result[name] = {'count': len(ordered), 'max': ordered[-1] / 1e6,
+                        **{f'p{q}': _percentile(ordered, q / 100) / 1e6 for q in (50, 90, 99)}}
+    return result
+
+
+def format_summary(stats=None):
+    """One line of 'name p50/p90' in ms, e.g. for a status bar."""
+    stats = summary() if stats is None else stats
+    if not stats:
+        return "暂无追踪数据"
+    return "p50/p90 ms  " + "  ".join(f"{name} {s['p50']:.1f}/{s['p90']:.1f}"
+                                      for name, s in stats.items())
+
+
+def chrome_trace():
+    """Returns the recorded spans in the Chrome trace event format."""
+    pid = os.getpid()
+    events = [{'name': name, 'ph': 'X', 'ts': start / 1e3, 'dur': duration / 1e3,
+               'pid': pid, 'tid': tid}
+              for name, start, duration, tid in list(_events)]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path):
+    """Writes chrome_trace() to `path` as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f, ensure_ascii=False)